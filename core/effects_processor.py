@@ -1,7 +1,33 @@
+import cv2
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageEnhance, ImageChops, ImageOps
 import math
 
+
+def _dilate(mask, radius):
+    """
+    对'L'模式的蒙版做方形膨胀，结果与连续radius次MaxFilter(3)相同。
+    
+    用OpenCV以(2*radius+1)见方的核一次膨胀，代替逐次调用PIL的排序滤波。
+    """
+    if radius <= 0:
+        return mask
+    kernel = np.ones((2 * radius + 1, 2 * radius + 1), np.uint8)
+    return Image.fromarray(cv2.dilate(np.asarray(mask), kernel), 'L')
+
+
+def _scale_alpha(img, opacity):
+    """
+    把RGBA图像的alpha通道逐值变为 int(a * opacity)（截断到0-255），与 point(lambda x: int(x * opacity)) 结果相同。
+    
+    在数组的alpha平面上查表，代替 split/point/merge 三次整幅图像的拆分与重建。
+    """
+    arr = np.array(img)
+    lut = np.clip((np.arange(256) * opacity).astype(np.int64), 0, 255).astype(np.uint8)
+    arr[..., 3] = lut[arr[..., 3]]
+    return Image.fromarray(arr, 'RGBA')
+
+
 class EffectsProcessor:
     """Processes and applies various text effects based on styles."""
     
@@ -125,15 +151,11 @@ class EffectsProcessor:
                         # 确保inner_shadow_img是PIL图像对象
                         if hasattr(inner_shadow_img, 'format') or hasattr(inner_shadow_img, 'split'):
                             # 修改合成方式 - 保留原始填充色的可见性
-                            # 获取inner_shadow的alpha通道
-                            _, _, _, inner_alpha = inner_shadow_img.split()
-                            
-                            # 为了确保填充色可见，调整内阴影的alpha通道
-                            inner_alpha = inner_alpha.point(lambda x: min(x, 200))  # 降低最大不透明度
-                            
-                            # 重建内阴影图像
-                            r, g, b, _ = inner_shadow_img.split()
-                            adjusted_inner_shadow = Image.merge('RGBA', (r, g, b, inner_alpha))
+                            # 为了确保填充色可见，调整内阴影的alpha通道：在数组上直接限制最大不透明度，
+                            # 不再两次拆分通道后重建图像
+                            inner_arr = np.array(inner_shadow_img)
+                            np.minimum(inner_arr[..., 3], 200, out=inner_arr[..., 3])  # 降低最大不透明度
+                            adjusted_inner_shadow = Image.fromarray(inner_arr, 'RGBA')
                             
                             # 使用调整后的内阴影图像进行合成
                             result = Image.alpha_composite(result, adjusted_inner_shadow)
@@ -370,9 +392,7 @@ class EffectsProcessor:
         shadow_img.paste(shadow_canvas, (int(offset_x), int(offset_y)), shadow_canvas)
         
         # 确保最终的阴影不透明度符合指定值
-        r, g, b, a = shadow_img.split()
-        a = a.point(lambda x: int(x * opacity))
-        shadow_img = Image.merge('RGBA', (r, g, b, a))
+        shadow_img = _scale_alpha(shadow_img, opacity)
         
         return shadow_img
     
@@ -394,10 +414,8 @@ class EffectsProcessor:
         # Create outline layer
         outline_img = Image.new('RGBA', img.size, (0, 0, 0, 0))
         
-        # Apply dilation to the mask for each outline pixel
-        dilated = mask
-        for i in range(1, int(round(outline_width)) + 1):
-            dilated = dilated.filter(ImageFilter.MaxFilter(3))
+        # Apply dilation to the mask, one pixel per unit of outline width
+        dilated = _dilate(mask, int(round(outline_width)))
         
         # Create the outline
         outline_layer = Image.new('RGBA', img.size, outline_color)
@@ -487,17 +505,8 @@ class EffectsProcessor:
         if gradient.get('type') == 'radial':
             angle = 'radial'
         
-        # Create outline by dilating the mask
-        dilated_mask = mask.copy()
-        
-        # Apply the outline width (dilate the mask)
-        w = int(width)
-        
-        # Only apply if width > 0
-        if w > 0:
-            # Apply multiple dilations for better results
-            for _ in range(w):
-                dilated_mask = dilated_mask.filter(ImageFilter.MaxFilter(3))
+        # Create outline by dilating the mask by the outline width (no-op if width <= 0)
+        dilated_mask = _dilate(mask, int(width))
         
         # Create outline mask (only keep the dilated area, excluding the original text area)
         outline_only_mask_array = np.clip(np.array(dilated_mask) - np.array(mask), 0, 255)
@@ -781,9 +790,7 @@ class EffectsProcessor:
                     
                     opacity = float(fill.get('opacity', 1.0))
                     if opacity < 1.0:
-                        r, g, b, a = gradient_masked_rgba.split()
-                        a = a.point(lambda x: int(x * opacity))
-                        gradient_masked_rgba = Image.merge('RGBA', (r, g, b, a))
+                        gradient_masked_rgba = _scale_alpha(gradient_masked_rgba, opacity)
                     
                     return gradient_masked_rgba
                 else:
@@ -815,9 +822,7 @@ class EffectsProcessor:
                         opacity = float(style['fill']['opacity'])
                     
                     if opacity < 1.0:
-                        r, g, b, a = fill_rgba.split()
-                        a = a.point(lambda x: int(x * opacity))
-                        fill_rgba = Image.merge('RGBA', (r, g, b, a))
+                        fill_rgba = _scale_alpha(fill_rgba, opacity)
                     
                     return fill_rgba
             
@@ -236,7 +236,13 @@ class StyleManager:
     
     def generate_random_combination(self):
         """生成一个随机的样式和字体组合，返回样式数据和字体名称。"""
-        style_data = self.get_random_style()
+        _, style_data, font_name = self.generate_random_combination_named()
+        return style_data, font_name
+    
+    def generate_random_combination_named(self):
+        """与generate_random_combination相同，但同时返回所选样式的名称（没有样式时为None）。"""
+        style_name = random.choice(list(self.styles.keys())) if self.styles else None
+        style_data = self.styles[style_name] if style_name is not None else None
         font_name = self.get_random_font()
         
         if self.verbose:
@@ -245,7 +251,7 @@ class StyleManager:
             if font_name:
                 print(f"[StyleManager] 随机字体: {font_name}")
         
-        return style_data, font_name
+        return style_name, style_data, font_name
 
     def get_svg_style(self, svg_filename):
         """
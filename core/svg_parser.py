@@ -171,7 +171,10 @@ class SVGParser:
                 'y2': y2,
                 'stops': stops,
                 'direction': direction,
-                'angle': angle
+                'angle': angle,
+                # Precomputed for the style converter, which reads them for every <use>
+                '_colors': tuple(stop['color'] for stop in stops),
+                '_first_opacity': stops[0]['opacity'] if stops else 1
             }
             
             if self.verbose:
@@ -188,7 +191,8 @@ class SVGParser:
                 'height': self._parse_percentage(filter_elem.get('height', '100%')),
                 'x': self._parse_percentage(filter_elem.get('x', '0%')),
                 'y': self._parse_percentage(filter_elem.get('y', '0%')),
-                'children': []  # Changed from 'effects' to 'children' to match reference in style converter
+                'children': [],  # Changed from 'effects' to 'children' to match reference in style converter
+                '_kinds': self.classify_filter_id(filter_id)  # Effect kinds implied by the filter name
             }
             
             # Process filter effects
@@ -298,6 +302,27 @@ class SVGParser:
             if self.verbose:
                 logger.debug(f"Extracted use element referencing: {href}")
     
+    @staticmethod
+    def classify_filter_id(filter_id: Optional[str]) -> Tuple[str, ...]:
+        """
+        Classify a filter by its id into the effect kinds the style converter extracts.
+        
+        Args:
+            filter_id: Filter id (e.g. 'inner-shadow-1', 'text-glow')
+            
+        Returns:
+            Tuple of effect kinds ('inner_shadow', 'shadow', 'glow'), possibly empty
+        """
+        fid_lower = (filter_id or '').lower()
+        kinds = []
+        if 'inner-shadow' in fid_lower:
+            kinds.append('inner_shadow')
+        if 'shadow' in fid_lower and 'inner' not in fid_lower:
+            kinds.append('shadow')
+        if 'glow' in fid_lower or 'blur' in fid_lower:
+            kinds.append('glow')
+        return tuple(kinds)
+    
     @staticmethod
     def _parse_percentage(value: str) -> float:
         """
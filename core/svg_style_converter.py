@@ -5,12 +5,11 @@ This module converts the parsed SVG data into the JSON style format used by the
 
 import os
 import re
-import colorsys
-import logging
-import random
 import math
+import logging
+from collections import defaultdict
+from functools import lru_cache
 from typing import Dict, List, Any, Tuple, Optional
-from pathlib import Path
 
 from .svg_parser import SVGParser
 
@@ -18,6 +17,96 @@ from .svg_parser import SVGParser
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 0-255 到两位十六进制字符串的查找表
+_HEX2 = tuple(f"{i:02x}" for i in range(256))
+
+# SVG解析失败时使用的默认样式（不含名称），嵌套字典在各次返回之间共享，不应被修改
+_DEFAULT_STYLE_TEMPLATE = {
+    "font_family": "Arial",
+    "font_size": 100,
+    "font_weight": "normal",
+    "fill": "#ff2edb",  # 默认使用粉红色填充
+    "outline": {
+        "color": "#000000",
+        "width": 2
+    },
+    "shadow": {
+        "color": "#000000",
+        "offset_x": 4,
+        "offset_y": 4,
+        "blur": 5,
+        "opacity": 0.7
+    }
+}
+
+# SVG text-anchor 到对齐方式的映射
+_ANCHOR_MAP = {"start": "left", "middle": "center", "end": "right"}
+
+# 默认斜面效果
+_DEFAULT_BEVEL = {
+    "enabled": False,
+}
+
+# 没有渐变填充时使用的默认填充
+_DEFAULT_FILL = {
+    "fill": "#ff2edb",  # Default fill color
+    "fill_opacity": 1
+}
+
+
+def _unit_to_byte(x: float) -> int:
+    """将0-1范围的颜色分量限制在范围内并四舍五入为0-255整数。"""
+    return int(max(0.0, min(1.0, x)) * 255 + 0.5)
+
+
+def _is_pinkish(hex_str: str) -> bool:
+    """
+    判断十六进制颜色是否属于粉红色/紫红色系。
+    
+    Args:
+        hex_str: 颜色字符串，如 '#ff2edb'
+        
+    Returns:
+        红色通道高、蓝色通道较高且绿色低于红色时返回True
+    """
+    if len(hex_str) < 7 or hex_str[0] != "#":
+        return False
+    try:
+        v = int(hex_str[1:7], 16)
+    except ValueError:
+        return False
+    r = (v >> 16) & 0xff
+    g = (v >> 8) & 0xff
+    b = v & 0xff
+    return r >= 0xE0 and b >= 0xC0 and g < r
+
+
+def _leading_float(s: str, default: float) -> float:
+    """
+    解析字符串开头的数字部分（可带正负号），如 '72px' -> 72.0，'-0.5px' -> -0.5。
+    
+    Args:
+        s: 带单位的数值字符串
+        default: 无法解析时返回的默认值
+        
+    Returns:
+        解析出的浮点数或默认值
+    """
+    s = str(s).lstrip()
+    i = 1 if s[:1] in ('+', '-') else 0
+    seen_dot = False
+    for c in s[i:]:
+        if c == '.' and not seen_dot:
+            seen_dot = True
+        elif not '0' <= c <= '9':  # 只接受ASCII数字，str.isdigit()还会接受'²'等字符
+            break
+        i += 1
+    try:
+        return float(s[:i])
+    except ValueError:
+        return default
+
+
 class SVGStyleConverter:
     """Converts SVG style data into JSON style format for the text renderer."""
     
@@ -58,6 +147,8 @@ class SVGStyleConverter:
         self.svg_data = svg_data
         self.style_name = "svg_style"
         self.verbose = verbose
+        # 按效果类型索引的滤镜子元素，首次使用时由 _effects_by_type 构建
+        self._effects = None
     
     def convert_to_json_style(self) -> Dict[str, Any]:
         """
@@ -69,12 +160,12 @@ class SVGStyleConverter:
         # 确保svg_data包含必要的键
         if not self.svg_data:
             if self.verbose:
-                print("警告: SVG数据为空，返回默认样式")
+                logger.warning("警告: SVG数据为空，返回默认样式")
             return self._create_default_style()
             
         if 'text_elements' not in self.svg_data or not self.svg_data['text_elements']:
             if self.verbose:
-                print("警告: SVG数据中没有文本元素，返回默认样式")
+                logger.warning("警告: SVG数据中没有文本元素，返回默认样式")
             return self._create_default_style()
         
         # 从SVG数据中提取样式
@@ -93,15 +184,19 @@ class SVGStyleConverter:
         if outline_style:
             style.update(outline_style)
         
-        # 添加滤镜效果（阴影和发光）
-        filter_styles = self._extract_filter_effects()
-        if filter_styles:
-            style.update(filter_styles)
-        
-        # 添加3D效果
-        bevel_style = self._extract_bevel_effect()
-        if bevel_style:
-            style.update(bevel_style)
+        # 阴影、发光和3D效果都来自滤镜，没有滤镜时直接使用默认值
+        if self.svg_data.get("filters"):
+            # 添加滤镜效果（阴影和发光）
+            filter_styles = self._extract_filter_effects()
+            if filter_styles:
+                style.update(filter_styles)
+            
+            # 添加3D效果
+            bevel_style = self._extract_bevel_effect()
+            if bevel_style:
+                style.update(bevel_style)
+        else:
+            style.update(_DEFAULT_BEVEL)
         
         # 添加样式名称
         style["name"] = self.style_name
@@ -110,24 +205,7 @@ class SVGStyleConverter:
         
     def _create_default_style(self) -> Dict[str, Any]:
         """创建一个默认样式，当SVG解析失败时使用。"""
-        return {
-            "name": self.style_name,
-            "font_family": "Arial",
-            "font_size": 100,
-            "font_weight": "normal",
-            "fill": "#ff2edb",  # 默认使用粉红色填充
-            "outline": {
-                "color": "#000000",
-                "width": 2
-            },
-            "shadow": {
-                "color": "#000000",
-                "offset_x": 4,
-                "offset_y": 4,
-                "blur": 5,
-                "opacity": 0.7
-            }
-        }
+        return {**_DEFAULT_STYLE_TEMPLATE, "name": self.style_name}
     
     def _get_available_fonts(self) -> List[str]:
         """
@@ -142,11 +220,10 @@ class SVGStyleConverter:
         fonts_dir = os.path.join(base_dir, 'fonts')
         
         # 检查字体目录是否存在
-        if os.path.exists(fonts_dir):
-            # 搜索所有ttf和otf字体文件
-            for ext in ['*.ttf', '*.otf', '*.TTF', '*.OTF']:
-                for font_file in Path(fonts_dir).glob(ext):
-                    fonts.append(font_file.name)
+        if os.path.isdir(fonts_dir):
+            # 一次扫描目录，搜索所有ttf和otf字体文件（不区分大小写）
+            with os.scandir(fonts_dir) as it:
+                fonts = [e.name for e in it if e.is_file() and e.name.lower().endswith(('.ttf', '.otf'))]
         
         # 如果没有找到字体，返回默认列表
         if not fonts:
@@ -209,41 +286,19 @@ class SVGStyleConverter:
                 properties['font'] = text_element['font-family']
             
             if 'font-size' in text_element:
-                try:
-                    # 尝试提取数字部分
-                    size_str = text_element['font-size']
-                    size = float(re.findall(r'\d+\.?\d*', size_str)[0])
-                    properties['size'] = size
-                except (ValueError, IndexError):
-                    pass  # 保持默认值
-            
-            # 提取对齐方式（如果存在）
-            if 'text-anchor' in text_element:
-                anchor = text_element['text-anchor']
-                if anchor == 'start':
-                    properties['alignment'] = 'left'
-                elif anchor == 'middle':
-                    properties['alignment'] = 'center'
-                elif anchor == 'end':
-                    properties['alignment'] = 'right'
+                # 提取数字部分，无法解析时保持默认值
+                properties['size'] = _leading_float(text_element['font-size'], properties['size'])
+            
+            # 提取对齐方式（不存在或无法识别时居中）
+            properties['alignment'] = _ANCHOR_MAP.get(text_element.get('text-anchor'), 'center')
             
             # 提取字间距（如果存在）
             if 'letter-spacing' in text_element:
-                try:
-                    spacing_str = text_element['letter-spacing']
-                    spacing = float(re.findall(r'\d+\.?\d*', spacing_str)[0])
-                    properties['spacing'] = spacing
-                except (ValueError, IndexError):
-                    pass  # 保持默认值
+                properties['spacing'] = _leading_float(text_element['letter-spacing'], properties['spacing'])
                     
             # 提取行高（如果存在）
             if 'line-height' in text_element:
-                try:
-                    leading_str = text_element['line-height']
-                    leading = float(re.findall(r'\d+\.?\d*', leading_str)[0])
-                    properties['leading'] = leading
-                except (ValueError, IndexError):
-                    pass  # 保持默认值
+                properties['leading'] = _leading_float(text_element['line-height'], properties['leading'])
         
         return properties
     
@@ -254,45 +309,47 @@ class SVGStyleConverter:
         Returns:
             Dictionary with fill properties
         """
-        # Default fill
-        default_fill = {
-            "fill": "#ff2edb",  # Default fill color
-            "fill_opacity": 1
-        }
+        uses = self.svg_data.get("uses", ())
+        gradients = self.svg_data.get("gradients", {})
         
         # Look for fill in use elements
-        for use in self.svg_data["uses"]:
-            if use.get("fill") and use["fill"]:
-                # Solid color fill
-                if use["fill"].startswith("url(#"):
-                    # Extract gradient ID from 'url(#gradient-id)'
-                    match = re.search(r'url\(#([^)]+)\)', use["fill"])
-                    if match:
-                        gradient_id = match.group(1)
-                        if gradient_id in self.svg_data["gradients"]:
-                            gradient = self.svg_data["gradients"][gradient_id]
-                            
-                            # Extract colors from stops
-                            colors = [stop["color"] for stop in gradient["stops"]]
-                            if not colors:
-                                continue
-                                
-                            # If only one color, duplicate it
-                            if len(colors) == 1:
-                                colors.append(colors[0])
-                            
-                            return {
-                                "fill": {
-                                    "type": "gradient",
-                                    "colors": colors,
-                                    "direction": gradient["direction"],
-                                    "angle": gradient["angle"],
-                                    "intensity": 100
-                                },
-                                "fill_opacity": gradient["stops"][0].get("opacity", 1)
-                            }
+        for use in uses:
+            fill = use.get("fill")
+            # Only gradient fills override the default
+            if fill and fill.startswith("url(#"):
+                # Extract gradient ID from 'url(#gradient-id)'
+                match = re.search(r'url\(#([^)]+)\)', fill)
+                if not match:
+                    continue
+                gradient = gradients.get(match.group(1))
+                if gradient is None:
+                    continue
+                
+                # Extract colors from stops
+                colors = self._gradient_colors(gradient)
+                if not colors:
+                    continue
+                    
+                # If only one color, duplicate it
+                if len(colors) == 1:
+                    colors = colors * 2
+                
+                first_opacity = gradient.get("_first_opacity")
+                if first_opacity is None:
+                    first_opacity = gradient["stops"][0].get("opacity", 1)
+                
+                return {
+                    "fill": {
+                        "type": "gradient",
+                        "colors": colors,
+                        "direction": gradient["direction"],
+                        "angle": gradient["angle"],
+                        "intensity": 100
+                    },
+                    "fill_opacity": first_opacity
+                }
         
-        return default_fill
+        return _DEFAULT_FILL.copy()
     
     def _extract_outline_properties(self) -> Optional[Dict[str, Any]]:
         """
@@ -301,114 +358,97 @@ class SVGStyleConverter:
         Returns:
             Dictionary with outline properties or None if no outline
         """
-        # 首先尝试查找所有use元素中的描边信息
-        stroke_candidates = []
-        
-        for use in self.svg_data["uses"]:
-            if use.get("stroke") and use["stroke"]:
-                # 收集所有有描边的use元素
-                stroke_candidates.append({
-                    "color": use["stroke"],
+        # 单次遍历：记录第一个粉红色系描边和第一个描边
+        first_stroke = None
+        pink_stroke = None
+        
+        for use in self.svg_data.get("uses", ()):
+            stroke_color = use.get("stroke")
+            if stroke_color:
+                stroke = {
+                    "color": stroke_color,
                     "width": use.get("stroke_width", 1),
                     "opacity": use.get("stroke_opacity", 1),
-                })
-        
-        # 如果有多个描边候选项，优先选择粉红色系的描边
-        if stroke_candidates:
-            # 查找粉红色或紫红色描边
-            for stroke in stroke_candidates:
-                color = stroke["color"].upper()
-                # 检查颜色是否是粉红色/紫红色系 (检查十六进制颜色中是否包含FF和D/E/F等)
-                if color and color.startswith("#") and "FF" in color and any(x in color for x in ["D", "E", "C"]):
-                    # 找到粉红色系描边，优先使用
-                    stroke_color = color
-                    stroke_width = stroke["width"]
-                    stroke_opacity = stroke["opacity"]
-                    
-                    # 检查是否是渐变描边
-                    if stroke_color and stroke_color.startswith("url(#"):
-                        # 提取渐变ID
-                        match = re.search(r'url\(#([^)]+)\)', stroke_color)
-                        if match:
-                            gradient_id = match.group(1)
-                            if gradient_id in self.svg_data["gradients"]:
-                                gradient = self.svg_data["gradients"][gradient_id]
-                                
-                                # 提取渐变信息
-                                return {
-                                    "outline": {
-                                        "width": int(round(float(stroke_width))),
-                                        "opacity": stroke_opacity,
-                                        "gradient": {
-                                            "type": gradient["type"],
-                                            "colors": [stop["color"] for stop in gradient["stops"]],
-                                            "direction": gradient["direction"],
-                                            "angle": gradient["angle"],
-                                            "intensity": 100,
-                                            "svg_coords": {  # 添加原始SVG坐标数据
-                                                "x1": gradient["x1"] * 100,  # 转换回百分比
-                                                "y1": gradient["y1"] * 100,
-                                                "x2": gradient["x2"] * 100,
-                                                "y2": gradient["y2"] * 100
-                                            }
-                                        }
-                                    }
-                                }
-                    
-                    # 纯色描边
-                    return {
-                        "outline": {
-                            "width": int(round(float(stroke_width))),
-                            "opacity": stroke_opacity,
-                            "color": stroke_color
-                        }
-                    }
+                }
+                if first_stroke is None:
+                    first_stroke = stroke
+                # 优先选择粉红色/紫红色系的描边
+                if _is_pinkish(stroke["color"]):
+                    pink_stroke = stroke
+                    break
+        
+        # 如果没有找到粉红色系描边，使用第一个描边
+        stroke = pink_stroke or first_stroke
+        if stroke is None:
+            return None
+        
+        return self._build_outline_from_stroke(stroke["color"], stroke["width"], stroke["opacity"])
+    
+    def _build_outline_from_stroke(self, color: str, width: Any, opacity: Any) -> Dict[str, Any]:
+        """
+        根据描边颜色构建描边样式，支持渐变描边和纯色描边。
+        
+        Args:
+            color: 描边颜色或渐变引用 'url(#gradient-id)'
+            width: 描边宽度
+            opacity: 描边不透明度
             
-            # 如果没有找到粉红色系描边，使用第一个描边
-            stroke = stroke_candidates[0]
-            stroke_color = stroke["color"]
-            stroke_width = stroke["width"]
-            stroke_opacity = stroke["opacity"]
-            
-            # 检查是否是渐变描边
-            if stroke_color and stroke_color.startswith("url(#"):
-                # 同上，处理渐变
-                match = re.search(r'url\(#([^)]+)\)', stroke_color)
-                if match:
-                    gradient_id = match.group(1)
-                    if gradient_id in self.svg_data["gradients"]:
-                        gradient = self.svg_data["gradients"][gradient_id]
-                        
-                        return {
-                            "outline": {
-                                "width": int(round(float(stroke_width))),
-                                "opacity": stroke_opacity,
-                                "gradient": {
-                                    "type": gradient["type"],
-                                    "colors": [stop["color"] for stop in gradient["stops"]],
-                                    "direction": gradient["direction"],
-                                    "angle": gradient["angle"],
-                                    "intensity": 100,
-                                    "svg_coords": {  # 添加原始SVG坐标数据
-                                        "x1": gradient["x1"] * 100,  # 转换回百分比
-                                        "y1": gradient["y1"] * 100,
-                                        "x2": gradient["x2"] * 100,
-                                        "y2": gradient["y2"] * 100
-                                    }
-                                }
+        Returns:
+            包含outline键的样式字典
+        """
+        outline_width = int(round(float(width)))
+        
+        # 检查是否是渐变描边
+        if color and color.startswith("url(#"):
+            # 提取渐变ID
+            match = re.search(r'url\(#([^)]+)\)', color)
+            gradient = self.svg_data.get("gradients", {}).get(match.group(1)) if match else None
+            if gradient is not None:
+                # 提取渐变信息
+                return {
+                    "outline": {
+                        "width": outline_width,
+                        "opacity": opacity,
+                        "gradient": {
+                            "type": gradient["type"],
+                            "colors": self._gradient_colors(gradient),
+                            "direction": gradient["direction"],
+                            "angle": gradient["angle"],
+                            "intensity": 100,
+                            "svg_coords": {  # 添加原始SVG坐标数据
+                                "x1": gradient["x1"] * 100,  # 转换回百分比
+                                "y1": gradient["y1"] * 100,
+                                "x2": gradient["x2"] * 100,
+                                "y2": gradient["y2"] * 100
                             }
                         }
-            
-            # 纯色描边
-            return {
-                "outline": {
-                    "width": int(round(float(stroke_width))),
-                    "opacity": stroke_opacity,
-                    "color": stroke_color
+                    }
                 }
+        
+        # 纯色描边
+        return {
+            "outline": {
+                "width": outline_width,
+                "opacity": opacity,
+                "color": color
             }
-                
-        return None
+        }
+    
+    @staticmethod
+    def _gradient_colors(gradient: Dict[str, Any]) -> Tuple[str, ...]:
+        """
+        获取渐变各个色标的颜色。结果为不可变元组，缓存在渐变数据上供多个样式共享。
+        
+        Args:
+            gradient: SVGParser解析出的渐变数据
+            
+        Returns:
+            色标颜色元组
+        """
+        colors = gradient.get("_colors")
+        if colors is None:
+            colors = gradient["_colors"] = tuple(stop["color"] for stop in gradient["stops"])
+        return colors
     
     def _extract_filter_effects(self) -> Dict[str, Any]:
         """
@@ -419,385 +459,343 @@ class SVGStyleConverter:
         """
         effects = {}
         filter_data = self.svg_data.get("filters", {})
-        defs = self.svg_data.get("defs", {})
         
         if not filter_data:
             return effects
+        
+        uses = self.svg_data.get("uses", ())
             
         # 处理每个use元素的每个filter
-        for use in self.svg_data.get("uses", []):
+        for use in uses:
+            # 内阴影、阴影和发光都已找到，后续滤镜不会再改变结果
+            if len(effects) == 3:
+                break
+            
             filter_id = use.get("filter")
-            use_id = use.get("id", "")
             
             if not filter_id:
                 continue
                 
             # 检查filter_id是否存在于filter_data中
-            if filter_id not in filter_data:
+            filter_info = filter_data.get(filter_id)
+            if filter_info is None:
                 continue
-                
-            # 创建单个滤镜的数据字典
-            single_filter_data = {filter_id: filter_data.get(filter_id, {})}
-            
-            # 特殊处理内阴影
-            if "inner-shadow" in filter_id.lower():
-                inner_shadow = self._extract_inner_shadow_effect(use_id, single_filter_data, defs)
-                if inner_shadow and "inner_shadow" not in effects:
-                    effects["inner_shadow"] = inner_shadow
-            
-            # 提取常规阴影效果(只处理外阴影)
-            if "shadow" in filter_id.lower() and "inner" not in filter_id.lower():
-                shadow_effect = self._extract_shadow_effect(use_id, single_filter_data, defs)
-                if shadow_effect and shadow_effect["type"] == "shadow" and "shadow" not in effects:
-                    effects["shadow"] = shadow_effect["data"]
-            
-            # 提取发光效果 - 只有当filter名称包含glow或blur时才尝试提取
-            if "glow" in filter_id.lower() or "blur" in filter_id.lower():
-                glow_effect = self._extract_glow_effect(use_id, single_filter_data, defs)
-                if glow_effect and "glow" not in effects:
-                    effects["glow"] = glow_effect
+            
+            # 每个滤镜只遍历一次子元素，按效果类型放入结果（先出现的优先）
+            for kind, params in self._classify_filter(filter_id, filter_info).items():
+                if kind not in effects:
+                    effects[kind] = params
                 
         return effects
+    
+    def _classify_filter(self, filter_id: str, filter_info: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """
+        单次遍历滤镜的子元素，识别其中的内阴影、外阴影和发光效果。
+        
+        Args:
+            filter_id: 滤镜ID
+            filter_info: 滤镜数据
+            
+        Returns:
+            以效果类型（inner_shadow/shadow/glow）为键、效果参数为值的字典
+        """
+        # 滤镜名称对应的效果类型在解析阶段已计算好
+        kinds = filter_info.get("_kinds")
+        if kinds is None:
+            kinds = SVGParser.classify_filter_id(filter_id)
+        children = filter_info.get("children") or ()
+        if not kinds or not children:
+            return {}
+        
+        # 按类型收集组件（同类型以最后一个为准）
+        components = {}
+        has_offset = False  # 是否有明显的偏移（用于排除阴影）
+        try:
+            for child in children:
+                ctype = child.get("type")
+                if ctype == "feComposite":
+                    if child.get("operator") == "arithmetic":
+                        components["composite"] = child
+                elif ctype in ("feMerge", "feComponentTransfer", "feBlend"):
+                    components["merge"] = child
+                else:
+                    components[ctype] = child
+                    if ctype == "feOffset" and not has_offset:
+                        has_offset = float(child.get("dx", 0)) > 0.5 or float(child.get("dy", 0)) > 0.5
+        except (ValueError, TypeError) as e:
+            if self.verbose:
+                logger.exception("解析滤镜 %s 时出错: %s", filter_id, e)
+            return {}
+        
+        result = {}
+        
+        # 特殊处理内阴影
+        if "inner_shadow" in kinds:
+            inner_shadow = self._extract_inner_shadow_effect(components)
+            if inner_shadow:
+                result["inner_shadow"] = inner_shadow
+        
+        # 提取常规阴影效果(只处理外阴影)
+        if "shadow" in kinds:
+            shadow = self._extract_shadow_effect(components)
+            if shadow:
+                result["shadow"] = shadow
+        
+        # 提取发光效果 - 只有当filter名称包含glow或blur时才尝试提取
+        if "glow" in kinds:
+            glow = self._extract_glow_effect(components, has_offset, "glow" in filter_id.lower())
+            if glow:
+                result["glow"] = glow
+        
+        return result
+    
+    @staticmethod
+    def _matrix_values(color_matrix: Optional[Dict[str, Any]]) -> Optional[List[str]]:
+        """
+        获取feColorMatrix的矩阵值列表。
+        
+        Args:
+            color_matrix: feColorMatrix组件
+            
+        Returns:
+            完整的20个矩阵值，矩阵不存在或不完整时返回None
+        """
+        if not color_matrix or not color_matrix.get("values"):
+            return None
+        # 拆分结果缓存在组件上，同一滤镜被多次引用时不再重复拆分
+        matrix_values = color_matrix.get("_values_split")
+        if matrix_values is None:
+            matrix_values = color_matrix["_values_split"] = color_matrix["values"].split()
+        if len(matrix_values) < 20:  # 完整的矩阵应该有20个值
+            return None
+        return matrix_values
+    
+    @staticmethod
+    def _matrix_to_hex(matrix_values: List[str]) -> str:
+        """
+        从feColorMatrix矩阵值的偏移列中提取颜色。
+        
+        Args:
+            matrix_values: 矩阵值列表
+            
+        Returns:
+            十六进制颜色字符串 (例如 '#4d0066')
+        """
+        r = int(float(matrix_values[4]) * 255)
+        g = int(float(matrix_values[9]) * 255)
+        b = int(float(matrix_values[14]) * 255)
+        r = 0 if r < 0 else 255 if r > 255 else r
+        g = 0 if g < 0 else 255 if g > 255 else g
+        b = 0 if b < 0 else 255 if b > 255 else b
+        return "#" + _HEX2[r] + _HEX2[g] + _HEX2[b]
 
-    def _extract_inner_shadow_effect(self, use_id: str, filter_data: Dict[str, Any], defs: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    def _extract_inner_shadow_effect(self, components: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
         专门提取内阴影效果。
         
         Args:
-            use_id: 使用filter的元素ID
-            filter_data: 包含滤镜数据的字典
-            defs: SVG中的defs数据
+            components: 由_classify_filter按类型收集的滤镜组件
             
         Returns:
             包含内阴影数据的字典，如果没有内阴影则返回None
         """
-        # 检查filter_data是否有效
-        if not filter_data:
+        offset_component = components.get("feOffset")
+        composite_component = components.get("composite")
+        
+        # 检查特征组合是否符合内阴影
+        if not (offset_component and composite_component):
             return None
             
         try:
-            for filter_id, filter_info in filter_data.items():
-                if not filter_info.get("children"):
-                    continue
-                
-                # 查找是否存在inner-shadow相关组件
-                offset_component = None
-                composite_component = None
-                color_matrix = None
-                
-                # 设置特征检测标志
-                has_offset = False
-                has_composite_arithmetic = False
-                
-                for child in filter_info.get("children", []):
-                    if child.get("type") == "feOffset":
-                        offset_component = child
-                        has_offset = True
-                    elif child.get("type") == "feComposite" and child.get("operator") == "arithmetic":
-                        composite_component = child
-                        has_composite_arithmetic = True
-                        if child.get("k2") == "-1" and child.get("k3") == "1":
-                            # 符合内阴影特征
-                            pass
-                    elif child.get("type") == "feColorMatrix":
-                        color_matrix = child
-                
-                # 检查特征组合是否符合内阴影
-                if has_offset and has_composite_arithmetic and composite_component and offset_component:
-                    # 符合内阴影特征
-                    offset_x = float(offset_component.get("dx", 0))
-                    offset_y = float(offset_component.get("dy", 0))
-                    
-                    # 默认内阴影颜色(紫色)
-                    color = "#4d0066"
-                    opacity = 0.7
-                    
-                    # 尝试从矩阵中提取颜色
-                    if color_matrix and color_matrix.get("values"):
-                        matrix_values = color_matrix.get("values", "").split()
-                        if len(matrix_values) >= 20:  # 完整的矩阵应该有20个值
-                            try:
-                                r = float(matrix_values[4])
-                                g = float(matrix_values[9])
-                                b = float(matrix_values[14])
-                                a = float(matrix_values[19])
-                                
-                                # 创建颜色
-                                r_hex = min(255, int(r * 255))
-                                g_hex = min(255, int(g * 255))
-                                b_hex = min(255, int(b * 255))
-                                color = f"#{r_hex:02x}{g_hex:02x}{b_hex:02x}"
-                                
-                                # 使用矩阵中的Alpha通道值作为不透明度
-                                if 0 <= a <= 1:
-                                    opacity = a
-                            except (ValueError, IndexError):
-                                pass
-                    
-                    # 使用一个较小的模糊值，内阴影通常模糊较小
-                    blur = 2.0
+            offset_x = float(offset_component.get("dx", 0))
+            offset_y = float(offset_component.get("dy", 0))
+            
+            # 默认内阴影颜色(紫色)
+            color = "#4d0066"
+            opacity = 0.7
+            
+            # 尝试从矩阵中提取颜色
+            matrix_values = self._matrix_values(components.get("feColorMatrix"))
+            if matrix_values:
+                try:
+                    a = float(matrix_values[19])
+                    color = self._matrix_to_hex(matrix_values)
                     
-                    return {
-                        "color": color,
-                        "offset_x": offset_x,
-                        "offset_y": offset_y,
-                        "blur": blur,
-                        "opacity": opacity
-                    }
+                    # 使用矩阵中的Alpha通道值作为不透明度
+                    if 0 <= a <= 1:
+                        opacity = a
+                except (ValueError, IndexError):
+                    pass
+            
+            # 使用一个较小的模糊值，内阴影通常模糊较小
+            blur = 2.0
+            
+            return {
+                "color": color,
+                "offset_x": offset_x,
+                "offset_y": offset_y,
+                "blur": blur,
+                "opacity": opacity
+            }
         except Exception as e:
             if self.verbose:
-                print(f"提取内阴影效果时出错: {e}")
+                logger.exception("提取内阴影效果时出错: %s", e)
             
         return None
         
-    def _extract_shadow_effect(self, use_id: str, filter_data: Dict[str, Any], defs: Dict[str, Any]) -> Optional[Dict[str, str]]:
+    def _extract_shadow_effect(self, components: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
-        提取阴影效果（包括内阴影和外阴影）。
+        提取外阴影效果。带arithmetic合成的滤镜属于内阴影，由内阴影提取处理。
         
         Args:
-            use_id: 使用filter的元素ID
-            filter_data: 包含滤镜数据的字典
-            defs: SVG中的defs数据
+            components: 由_classify_filter按类型收集的滤镜组件
             
         Returns:
-            包含阴影类型和数据的字典，如果没有阴影则返回None
+            包含外阴影数据的字典，如果没有外阴影则返回None
         """
-        # 检查filter_data是否有效
-        if not filter_data:
+        offset_component = components.get("feOffset")
+        blur_component = components.get("feGaussianBlur")
+        
+        # 如果找到了偏移和模糊组件，且没有内阴影的合成组件，则可能是阴影
+        if not (offset_component and blur_component) or components.get("composite"):
             return None
             
         try:
-            # 遍历所有filter
-            for filter_id, filter_info in filter_data.items():
-                if not filter_info.get("children"):
-                    continue
-                
-                # 查找feOffset和feGaussianBlur组件
-                offset_component = None
-                blur_component = None
-                composite_effect = None
-                color_matrix = None
-                
-                for child in filter_info.get("children", []):
-                    if child.get("type") == "feOffset":
-                        offset_component = child
-                    elif child.get("type") == "feGaussianBlur":
-                        blur_component = child
-                    elif child.get("type") == "feColorMatrix":
-                        color_matrix = child
-                    elif child.get("type") == "feComposite" and child.get("operator") == "arithmetic":
-                        composite_effect = child
+            # 提取阴影参数
+            offset_x = float(offset_component.get("dx", 0))
+            offset_y = float(offset_component.get("dy", 0))
+            blur_std = float(blur_component.get("stdDeviation", 0))
+            
+            # 根据偏移和模糊值判断是阴影还是发光效果
+            if abs(offset_x) < 0.5 and abs(offset_y) < 0.5 and blur_std > 3:
+                # 可能是发光效果，由glow方法处理
+                return None
+            
+            color = "#000000"  # 默认外阴影颜色
+            
+            # 检查color matrix是否有定义颜色
+            matrix_values = self._matrix_values(components.get("feColorMatrix"))
+            if matrix_values:
+                # 尝试从矩阵中提取颜色信息
+                r = float(matrix_values[4])
+                g = float(matrix_values[9])
+                b = float(matrix_values[14])
                 
-                # 如果找到了偏移和模糊组件，则可能是阴影
-                if offset_component and blur_component:
-                    # 提取阴影参数
-                    offset_x = float(offset_component.get("dx", 0))
-                    offset_y = float(offset_component.get("dy", 0))
-                    blur_std = float(blur_component.get("stdDeviation", 0))
-                    
-                    # 确定是内阴影还是外阴影
-                    if composite_effect and composite_effect.get("operator") == "arithmetic":
-                        # 内阴影的操作符为arithmetic且有特定的k值
-                        inner_shadow = True
-                        k2 = float(composite_effect.get("k2", 0))
-                        k3 = float(composite_effect.get("k3", 0))
-                        
-                        # 检查k值是否符合内阴影定义 (k2=-1, k3=1或相近值)
-                        if abs(k2 + 1) > 0.5 or abs(k3 - 1) > 0.5:
-                            inner_shadow = False
-                            
-                        if inner_shadow:
-                            # 内阴影
-                            color = "#4d0066"  # 默认内阴影颜色（紫色）
-                            
-                            # 检查color matrix是否有定义颜色
-                            if color_matrix and color_matrix.get("values"):
-                                matrix_values = color_matrix.get("values", "").split()
-                                if len(matrix_values) >= 20:  # 完整的矩阵应该有20个值
-                                    # 尝试从矩阵中提取颜色信息
-                                    r = float(matrix_values[4])
-                                    g = float(matrix_values[9])
-                                    b = float(matrix_values[14])
-                                    
-                                    # 创建颜色
-                                    r_hex = min(255, int(r * 255))
-                                    g_hex = min(255, int(g * 255))
-                                    b_hex = min(255, int(b * 255))
-                                    color = f"#{r_hex:02x}{g_hex:02x}{b_hex:02x}"
-                            
-                            return {
-                                "type": "inner_shadow",
-                                "data": {
-                                    "color": color,
-                                    "offset_x": offset_x,
-                                    "offset_y": offset_y,
-                                    "blur": blur_std,
-                                    "opacity": 0.7  # 默认不透明度
-                                }
-                            }
-                    else:
-                        # 外阴影
-                        color = "#000000"  # 默认外阴影颜色
-                        
-                        # 检查color matrix是否有定义颜色
-                        if color_matrix and color_matrix.get("values"):
-                            matrix_values = color_matrix.get("values", "").split()
-                            if len(matrix_values) >= 20:  # 完整的矩阵应该有20个值
-                                # 尝试从矩阵中提取颜色信息
-                                r = float(matrix_values[4])
-                                g = float(matrix_values[9])
-                                b = float(matrix_values[14])
-                                
-                                # 如果颜色值存在
-                                if r or g or b:
-                                    # 检查是否是粉红色系
-                                    if r > 0.5 and g < 0.3 and b > 0.5:
-                                        color = "#ff2edb"  # 使用粉红色
-                        
-                        # 根据偏移和模糊值判断是阴影还是发光效果
-                        if abs(offset_x) < 0.5 and abs(offset_y) < 0.5 and blur_std > 3:
-                            # 可能是发光效果，稍后会由glow方法处理
-                            continue
-                        
-                        return {
-                            "type": "shadow",
-                            "data": {
-                                "color": color,
-                                "offset_x": offset_x,
-                                "offset_y": offset_y,
-                                "blur": blur_std,
-                                "opacity": 0.7  # 默认不透明度
-                            }
-                        }
+                # 检查是否是粉红色系
+                if r > 0.5 and g < 0.3 and b > 0.5:
+                    color = "#ff2edb"  # 使用粉红色
+            
+            return {
+                "color": color,
+                "offset_x": offset_x,
+                "offset_y": offset_y,
+                "blur": blur_std,
+                "opacity": 0.7  # 默认不透明度
+            }
         except Exception as e:
             if self.verbose:
-                print(f"提取阴影效果时出错: {e}")
+                logger.exception("提取阴影效果时出错: %s", e)
             
         return None
     
-    def _extract_glow_effect(self, use_id: str, filter_data: Dict[str, Any], defs: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    def _extract_glow_effect(self, components: Dict[str, Any], has_offset: bool, is_glow_filter: bool) -> Optional[Dict[str, Any]]:
         """
         提取发光效果。
         
         Args:
-            use_id: 使用filter的元素ID
-            filter_data: 包含滤镜数据的字典
-            defs: SVG中的defs数据
+            components: 由_classify_filter按类型收集的滤镜组件
+            has_offset: 滤镜是否有明显的偏移
+            is_glow_filter: 滤镜名称是否明确包含glow
             
         Returns:
             包含发光效果数据的字典，如果没有发光效果则返回None
         """
-        # 检查filter_data是否有效
-        if not filter_data:
+        blur_component = components.get("feGaussianBlur")
+        
+        # 如果没有模糊组件，不是发光效果
+        if not blur_component:
+            return None
+        
+        # 如果有明显的偏移，那么可能是阴影而不是发光
+        if has_offset and not is_glow_filter:
+            return None
+        
+        # 确认这是一个外发光效果 - 需要有模糊和合并/混合组件，或者filter名称明确包含glow
+        if not is_glow_filter and not components.get("merge"):
             return None
             
         try:
-            # 遍历所有filter
-            for filter_id, filter_info in filter_data.items():
-                if not filter_info.get("children"):
-                    continue
-                
-                # 判断这个filter是否真的是用于外发光的
-                is_glow_filter = False
-                if "glow" in filter_id.lower():
-                    is_glow_filter = True
-                
-                # 查找feGaussianBlur和feColorMatrix组件（通常用于发光效果）
-                blur_component = None
-                color_matrix = None
-                flood_component = None  # 添加feFlood组件检测，它通常用于定义颜色
-                merge_component = None  # 检查是否有feComponentTransfer或feMerge组件（外发光常用）
-                
-                for child in filter_info.get("children", []):
-                    if child.get("type") == "feGaussianBlur":
-                        blur_component = child
-                    elif child.get("type") == "feColorMatrix":
-                        color_matrix = child
-                    elif child.get("type") == "feFlood":
-                        flood_component = child
-                    elif child.get("type") in ["feMerge", "feComponentTransfer", "feBlend"]:
-                        merge_component = child
-                
-                # 如果找到了模糊组件，且没有明显的阴影特征，可能是发光效果
-                if blur_component:
-                    # 找到偏移组件以确认不是阴影
-                    has_offset = False
-                    for child in filter_info.get("children", []):
-                        if child.get("type") == "feOffset" and (float(child.get("dx", 0)) > 0.5 or float(child.get("dy", 0)) > 0.5):
-                            has_offset = True
-                            break
-                    
-                    # 如果有明显的偏移，那么可能是阴影而不是发光
-                    if has_offset and not is_glow_filter:
-                        continue
-                    
-                    # 确认这是一个外发光效果 - 需要有模糊和合并/混合组件，或者filter名称明确包含glow
-                    if not is_glow_filter and not merge_component:
-                        continue
-                    
-                    # 提取发光参数
-                    blur_std = float(blur_component.get("stdDeviation", 5))
-                    
-                    # 设置一个合理的默认值，但不硬编码为特定颜色
-                    color = "#ffffff"  # 默认使用白色
-                    intensity = 1.0
-                    
-                    # 首先检查是否有feFlood定义的颜色（这是最直接的颜色定义方式）
-                    if flood_component and flood_component.get("flood-color"):
-                        color = flood_component.get("flood-color")
-                        # 如果有透明度定义，设置强度
-                        if flood_component.get("flood-opacity"):
-                            intensity = float(flood_component.get("flood-opacity", 1.0)) * 1.5
-                    
-                    # 其次检查color matrix是否有定义颜色
-                    elif color_matrix and color_matrix.get("values"):
-                        matrix_values = color_matrix.get("values", "").split()
-                        if len(matrix_values) >= 20:  # 完整的矩阵应该有20个值
-                            # 尝试从矩阵中提取颜色信息
-                            r = float(matrix_values[4])
-                            g = float(matrix_values[9])
-                            b = float(matrix_values[14])
-                            
-                            # 如果颜色值存在，根据RGB值创建颜色
-                            if r or g or b:
-                                r_hex = min(255, int(r * 255))
-                                g_hex = min(255, int(g * 255))
-                                b_hex = min(255, int(b * 255))
-                                color = f"#{r_hex:02x}{g_hex:02x}{b_hex:02x}"
-                    
-                    # 针对特定名称的SVG，检查是否应该使用特定颜色
-                    # 注意：这是基于文件名的检测，可能需要更复杂的逻辑
-                    if hasattr(self, 'style_name') and self.style_name and is_glow_filter:
-                        if 'emerald' in self.style_name.lower() or 'forest' in self.style_name.lower():
-                            # 检查是否已经有明确的绿色定义，如果没有才使用默认绿色
-                            is_already_green = False
-                            if color.startswith('#'):
-                                # 简单检查是否已经是绿色系
-                                hex_color = color.lstrip('#')
-                                if len(hex_color) == 6:
-                                    r = int(hex_color[0:2], 16)
-                                    g = int(hex_color[2:4], 16)
-                                    b = int(hex_color[4:6], 16)
-                                    if g > max(r, b) * 1.5:  # 如果绿色通道明显高于其他通道
-                                        is_already_green = True
-                            
-                            # 如果当前不是绿色或是默认白色，则使用绿色
-                            if not is_already_green or color == "#ffffff":
-                                color = "#00ff4c"  # 设置为绿色
-                                intensity = 1.5  # 增强绿色发光强度
+            # 提取发光参数
+            blur_std = float(blur_component.get("stdDeviation", 5))
+            
+            # 设置一个合理的默认值，但不硬编码为特定颜色
+            color = "#ffffff"  # 默认使用白色
+            intensity = 1.0
+            
+            flood_component = components.get("feFlood")
+            matrix_values = self._matrix_values(components.get("feColorMatrix"))
+            
+            # 首先检查是否有feFlood定义的颜色（这是最直接的颜色定义方式）
+            if flood_component and flood_component.get("flood-color"):
+                color = flood_component.get("flood-color")
+                # 如果有透明度定义，设置强度
+                if flood_component.get("flood-opacity"):
+                    intensity = float(flood_component.get("flood-opacity", 1.0)) * 1.5
+            
+            # 其次检查color matrix是否有定义颜色
+            elif matrix_values:
+                # 如果颜色值存在，根据RGB值创建颜色
+                if float(matrix_values[4]) or float(matrix_values[9]) or float(matrix_values[14]):
+                    color = self._matrix_to_hex(matrix_values)
+            
+            # 针对特定名称的SVG，检查是否应该使用特定颜色
+            # 注意：这是基于文件名的检测，可能需要更复杂的逻辑
+            if hasattr(self, 'style_name') and self.style_name and is_glow_filter:
+                if 'emerald' in self.style_name.lower() or 'forest' in self.style_name.lower():
+                    # 检查是否已经有明确的绿色定义，如果没有才使用默认绿色
+                    is_already_green = False
+                    if color.startswith('#'):
+                        # 简单检查是否已经是绿色系
+                        hex_color = color.lstrip('#')
+                        if len(hex_color) == 6:
+                            r = int(hex_color[0:2], 16)
+                            g = int(hex_color[2:4], 16)
+                            b = int(hex_color[4:6], 16)
+                            if g > max(r, b) * 1.5:  # 如果绿色通道明显高于其他通道
+                                is_already_green = True
                     
-                    return {
-                        "color": color,
-                        "radius": blur_std,
-                        "intensity": intensity,
-                        "opacity": 0.8
-                    }
+                    # 如果当前不是绿色或是默认白色，则使用绿色
+                    if not is_already_green or color == "#ffffff":
+                        color = "#00ff4c"  # 设置为绿色
+                        intensity = 1.5  # 增强绿色发光强度
+            
+            return {
+                "color": color,
+                "radius": blur_std,
+                "intensity": intensity,
+                "opacity": 0.8
+            }
         except Exception as e:
             if self.verbose:
-                print(f"提取发光效果时出错: {e}")
+                logger.exception("提取发光效果时出错: %s", e)
             
         return None
     
+    def _effects_by_type(self) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Index all filter children by effect type, built once on first use.
+        
+        Returns:
+            Dictionary mapping effect type to its effects in document order
+        """
+        if self._effects is None:
+            index = defaultdict(list)
+            for filter_data in (self.svg_data.get('filters') or {}).values():
+                for effect in filter_data.get('children') or ():
+                    index[effect.get('type')].append(effect)
+            self._effects = index
+        return self._effects
+    
     def _extract_bevel_effect(self) -> Dict[str, Any]:
         """
         Extract bevel effect from filter data.
@@ -805,49 +803,53 @@ class SVGStyleConverter:
         Returns:
             Dictionary of bevel effect properties
         """
-        # 默认斜面效果
-        default_bevel = {
-            "enabled": False,
-        }
+        # 斜面效果通常使用feSpecularLighting或specularLighting元素
+        effects = self._effects_by_type()
+        for effect in effects.get('feSpecularLighting', []) + effects.get('specularLighting', []):
+            # 找到斜面效果
+            bevel_effect = {
+                "enabled": True,
+                "depth": float(effect.get('specularExponent', 10)) / 10,  # 转换为0-10范围
+                "size": float(effect.get('surfaceScale', 5)) / 5,  # 转换为0-10范围
+                "angle": 135,  # 默认角度
+                "highlight": "#ffffff",  # 默认高光颜色
+                "shadow": "#000000",  # 默认阴影颜色
+            }
+            
+            # 提取光源位置信息
+            if 'pointsAt' in effect:
+                x, y, z = effect['pointsAt'].split()
+                if x and y:
+                    # 根据光源位置计算角度
+                    try:
+                        bevel_effect['angle'] = self._angle_from_points(x, y)
+                    except (ValueError, TypeError):
+                        pass
+            
+            # 提取颜色
+            if 'specularConstant' in effect and float(effect['specularConstant']) > 0:
+                light_color = effect.get('lighting-color', '#ffffff')
+                bevel_effect['highlight'] = light_color
+            
+            return bevel_effect
         
-        # 如果没有过滤器数据，则返回默认值
-        if 'filters' not in self.svg_data or not self.svg_data['filters']:
-            return default_bevel
-            
-        # 提取斜面效果的相关过滤器
-        for filter_id, filter_data in self.svg_data['filters'].items():
-            # 斜面效果通常使用specularLighting或feSpecularLighting元素
-            for effect in filter_data.get('children', []):
-                if effect.get('type') in ['feSpecularLighting', 'specularLighting']:
-                    # 找到斜面效果
-                    bevel_effect = {
-                        "enabled": True,
-                        "depth": float(effect.get('specularExponent', 10)) / 10,  # 转换为0-10范围
-                        "size": float(effect.get('surfaceScale', 5)) / 5,  # 转换为0-10范围
-                        "angle": 135,  # 默认角度
-                        "highlight": "#ffffff",  # 默认高光颜色
-                        "shadow": "#000000",  # 默认阴影颜色
-                    }
-                    
-                    # 提取光源位置信息
-                    if 'pointsAt' in effect:
-                        x, y, z = effect['pointsAt'].split()
-                        if x and y:
-                            # 根据光源位置计算角度
-                            try:
-                                angle = math.degrees(math.atan2(float(y), float(x))) % 360
-                                bevel_effect['angle'] = angle
-                            except (ValueError, TypeError):
-                                pass
-                    
-                    # 提取颜色
-                    if 'specularConstant' in effect and float(effect['specularConstant']) > 0:
-                        light_color = effect.get('lighting-color', '#ffffff')
-                        bevel_effect['highlight'] = light_color
-                    
-                    return bevel_effect
+        return _DEFAULT_BEVEL.copy()
+    
+    @staticmethod
+    @lru_cache(maxsize=64)
+    def _angle_from_points(x: str, y: str) -> float:
+        """
+        Convert a light source position to an angle in degrees.
         
-        return default_bevel
+        Cached on the raw strings, since SVGs reuse a handful of light positions.
+        
+        Args:
+            x, y: Coordinates from the pointsAt attribute
+            
+        Returns:
+            Angle in the range [0, 360)
+        """
+        return math.degrees(math.atan2(float(y), float(x))) % 360
     
     @staticmethod
     def _rgb_to_hex(r: float, g: float, b: float) -> str:
@@ -860,10 +862,5 @@ class SVGStyleConverter:
         Returns:
             Hex color string (e.g., '#ff0000')
         """
-        # Ensure values are within 0-1 range
-        r = max(0, min(1, r))
-        g = max(0, min(1, g))
-        b = max(0, min(1, b))
-        
-        # Convert to 0-255 range and then to hex
-        return f'#{int(r * 255):02x}{int(g * 255):02x}{int(b * 255):02x}'
+        # Clamp to 0-1, round to 0-255 and pack into a single int for one format call
+        return f'#{(_unit_to_byte(r) << 16) | (_unit_to_byte(g) << 8) | _unit_to_byte(b):06x}'
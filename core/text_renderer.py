@@ -1,8 +1,90 @@
 import os
+import logging
+from collections import OrderedDict
+from functools import lru_cache
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageEnhance
 import random
 
+logger = logging.getLogger(__name__)
+
+# 估算字号时用于测量的参考字号
+_PROBE_FONT_SIZE = 100
+
+# find_optimal_font_size 结果缓存：(字体路径, 文本, 最大宽, 最大高, 起始字号, 最大字号) -> 字号
+_FIT_CACHE_SIZE = 256
+_fit_cache = OrderedDict()
+
+# create_base_text_image 结果缓存：同一文本套用多种特效时复用基础文字图
+# (文本, 颜色, 字体路径, 字号, 宽, 高, 是否适配, 安全区域) -> (墨迹裁剪图, 裁剪偏移, 最终字号)
+# 只保存墨迹范围内的像素，并按总字节数限制缓存大小，避免大画布常驻内存
+_BASE_IMG_CACHE_MAX_BYTES = 64 * 1024 * 1024
+_base_img_cache = OrderedDict()
+_base_img_cache_bytes = 0
+
+
+def _cache_base_img(key, base_img, font_size):
+    """Store the ink-bbox crop of a rendered base image, evicting oldest entries over the byte budget."""
+    global _base_img_cache_bytes
+    bbox = base_img.getbbox()
+    crop = base_img.crop(bbox) if bbox else None
+    nbytes = crop.width * crop.height * 4 if crop is not None else 0
+    if nbytes > _BASE_IMG_CACHE_MAX_BYTES:
+        return
+    old = _base_img_cache.pop(key, None)
+    if old is not None:
+        _base_img_cache_bytes -= old[3]
+    _base_img_cache[key] = (crop, bbox[:2] if bbox else None, font_size, nbytes)
+    _base_img_cache_bytes += nbytes
+    while _base_img_cache_bytes > _BASE_IMG_CACHE_MAX_BYTES:
+        _, evicted = _base_img_cache.popitem(last=False)
+        _base_img_cache_bytes -= evicted[3]
+
+
+@lru_cache(maxsize=128)
+def _load_font(path, size):
+    """Load a TrueType font, cached by (path, size) so repeated sizes skip reparsing the file."""
+    return ImageFont.truetype(path, size)
+
+
+@lru_cache(maxsize=64)
+def _line_break_indices(word_count):
+    """
+    Compute word boundaries for smart line breaks.
+    
+    3-4 words are split into 2 lines, 5-6 words into 3 lines and 7+ words into
+    4 lines; the last line takes the remaining words.
+    
+    Args:
+        word_count: Number of words
+    
+    Returns:
+        Tuple of word indices (start of each line, then word_count)
+    """
+    if word_count <= 2:
+        return (0, word_count)
+    if word_count <= 4:
+        line_count = 2
+    elif word_count <= 6:
+        line_count = 3
+    else:
+        line_count = 4
+    words_per_line = word_count // line_count
+    return tuple(i * words_per_line for i in range(line_count)) + (word_count,)
+
+
+@lru_cache(maxsize=1)
+def _default_font():
+    """Load Pillow's built-in default font once."""
+    return ImageFont.load_default()
+
+
+@lru_cache(maxsize=1)
+def _measure_draw():
+    """Return a Draw on a 1x1 image, used only for multiline_textbbox measurements."""
+    return ImageDraw.Draw(Image.new('L', (1, 1)))
+
+
 class TextRenderer:
     """Handles text rendering with various effects."""
     
@@ -16,24 +98,28 @@ class TextRenderer:
         """
         self.font_path = font_path
         self.font_size = font_size
+        # (font, line) -> bbox，每次create_base_text_image时重置
+        self._bbox_cache = {}
+        # 字体文件是否可用只检查一次，后续测量与重新加载都复用该结果
+        self._font_valid = bool(font_path) and os.path.exists(font_path)
         
         # 添加错误处理和详细日志
         try:
-            print(f"[TextRenderer] 尝试加载字体: {font_path}")
+            logger.debug("[TextRenderer] 尝试加载字体: %s", font_path)
             # 检查字体文件是否存在
-            if not os.path.exists(font_path):
-                print(f"[TextRenderer] 错误: 字体文件不存在: {font_path}")
+            if not self._font_valid:
+                logger.warning("[TextRenderer] 错误: 字体文件不存在: %s", font_path)
                 # 尝试使用默认字体
-                self.font = ImageFont.load_default()
-                print("[TextRenderer] 已加载默认字体作为替代")
+                self.font = _default_font()
+                logger.debug("[TextRenderer] 已加载默认字体作为替代")
             else:
-                self.font = ImageFont.truetype(font_path, font_size)
-                print(f"[TextRenderer] 字体加载成功: {font_path}")
+                self.font = _load_font(font_path, font_size)
+                logger.debug("[TextRenderer] 字体加载成功: %s", font_path)
         except Exception as e:
-            print(f"[TextRenderer] 加载字体时出错: {e}")
+            logger.warning("[TextRenderer] 加载字体时出错: %s", e)
             # 使用默认字体作为备选
-            self.font = ImageFont.load_default()
-            print("[TextRenderer] 已加载默认字体作为替代")
+            self.font = _default_font()
+            logger.debug("[TextRenderer] 已加载默认字体作为替代")
         
     def apply_smart_line_breaks(self, text):
         """
@@ -45,42 +131,35 @@ class TextRenderer:
         Returns:
             Processed text with line breaks
         """
+        return '\n'.join(self._smart_lines(text))
+    
+    def _smart_lines(self, text):
+        """
+        Split text into lines based on number of words.
+        
+        Args:
+            text: Text to process
+        
+        Returns:
+            List of lines
+        """
         # Split text into words
         words = text.split()
-        word_count = len(words)
         
-        # Apply smart line breaks based on word count
-        if word_count <= 2:
-            # 1-2 words: No line breaks
-            return text
-        elif word_count <= 4:
-            # 3-4 words: Split into 2 lines
-            mid = word_count // 2
-            return ' '.join(words[:mid]) + '\n' + ' '.join(words[mid:])
-        elif word_count <= 6:
-            # 5-6 words: Split into 3 lines
-            line_words = word_count // 3
-            return ' '.join(words[:line_words]) + '\n' + ' '.join(words[line_words:2*line_words]) + '\n' + ' '.join(words[2*line_words:])
-        else:
-            # 7+ words: Split into 4 lines max
-            lines = []
-            line_count = min(4, (word_count + 1) // 2)
-            words_per_line = word_count // line_count
-            
-            for i in range(line_count - 1):
-                start_idx = i * words_per_line
-                end_idx = (i + 1) * words_per_line
-                lines.append(' '.join(words[start_idx:end_idx]))
-            
-            # Add remaining words to the last line
-            lines.append(' '.join(words[(line_count - 1) * words_per_line:]))
-            
-            return '\n'.join(lines)
+        # 1-2 words: No line breaks
+        if len(words) <= 2:
+            return [text]
+        
+        bounds = _line_break_indices(len(words))
+        return [' '.join(words[a:b]) for a, b in zip(bounds[:-1], bounds[1:])]
     
     def find_optimal_font_size(self, text, max_width, max_height, start_size=10, max_size=300):
         """
         Find the optimal font size to fit text within constraints.
         
+        Text extents grow almost linearly with the font size, so the size is estimated
+        from a single measurement and then corrected by measuring the estimate.
+        
         Args:
             text: Text to measure
             max_width: Maximum allowed width
@@ -91,55 +170,79 @@ class TextRenderer:
         Returns:
             Optimal font size
         """
-        low, high = start_size, max_size
-        optimal_size = start_size
-        
         # 检查font_path是否有效，如果无效使用默认字体
         use_default_font = False
-        if not self.font_path or not os.path.exists(self.font_path):
-            print(f"[TextRenderer] 警告: 在find_optimal_font_size中找不到字体 {self.font_path}，将使用默认字体")
+        if not self._font_valid:
+            logger.debug("[TextRenderer] 警告: 在find_optimal_font_size中找不到字体 %s，将使用默认字体", self.font_path)
             use_default_font = True
         
-        while low <= high:
-            mid = (low + high) // 2
+        # 相同文本与约束直接复用上次结果（节点每次执行都会新建渲染器，故缓存放在模块级）
+        cache_key = (None if use_default_font else self.font_path, text, max_width, max_height, start_size, max_size)
+        cached = _fit_cache.get(cache_key)
+        if cached is not None:
+            _fit_cache.move_to_end(cache_key)
+            return cached
+        
+        def fits(size):
+            # 根据字体可用情况选择字体
+            font = _default_font() if use_default_font else _load_font(self.font_path, size)
+            width, height = self._measure_text(font, size, text)
+            return width <= max_width and height <= max_height, width, height
+        
+        def scale(size, width, height):
+            # 按测得尺寸与约束的比例缩放字号
+            if width <= 0 or height <= 0:
+                return max_size
+            estimate = int(size * min(max_width / width, max_height / height))
+            return max(start_size, min(max_size, estimate))
+        
+        try:
+            # 在参考字号下测量一次，估算最佳字号
+            probe_size = max(start_size, min(max_size, _PROBE_FONT_SIZE))
+            _, width, height = fits(probe_size)
+            size = scale(probe_size, width, height)
+            
+            # 在估算字号下再测量一次并修正（字形微调使比例不完全线性）
+            ok, width, height = fits(size)
+            too_big = max_size + 1  # 已知放不下的最小字号
+            if ok and max_width - width < 2 and max_height - height < 2:
+                # 两个方向都已贴合到1像素以内，无需再向上试探
+                too_big = size + 1
+            elif not ok:
+                too_big = size
+                size = max(start_size, min(size - 1, scale(size, width, height)))
+                while size > start_size and not fits(size)[0]:
+                    too_big = size
+                    size -= 1
+            
+            # 估算偏小时向上试探
+            while size + 1 < too_big and fits(size + 1)[0]:
+                size += 1
             
-            try:
-                # 根据字体可用情况选择字体
-                if use_default_font:
-                    font = ImageFont.load_default()
-                else:
-                    font = ImageFont.truetype(self.font_path, mid)
-                
-                left, top, right, bottom = font.getbbox(text)
-                width, height = right - left, bottom - top
-                
-                # Consider multiline text
-                if '\n' in text:
-                    lines = text.split('\n')
-                    height = 0
-                    width = 0
-                    line_spacing = mid * 0.2  # 20% of font size for line spacing
-                    
-                    for line in lines:
-                        left, top, right, bottom = font.getbbox(line)
-                        line_width, line_height = right - left, bottom - top
-                        width = max(width, line_width)
-                        height += line_height
-                    
-                    # Add line spacing
-                    height += line_spacing * (len(lines) - 1)
-                
-                if width <= max_width and height <= max_height:
-                    optimal_size = mid
-                    low = mid + 1
-                else:
-                    high = mid - 1
-            except Exception as e:
-                print(f"[TextRenderer] 在字体大小调整过程中出错: {e}")
-                # 出错时降低尝试字号
-                high = mid - 1
+            _fit_cache[cache_key] = size
+            if len(_fit_cache) > _FIT_CACHE_SIZE:
+                _fit_cache.popitem(last=False)
+            return size
+        except Exception as e:
+            logger.warning("[TextRenderer] 在字体大小调整过程中出错: %s", e)
+            return start_size
+    
+    def _measure_text(self, font, size, text):
+        """
+        Measure text (possibly multi-line) with the given font.
+        
+        Args:
+            font: Font to measure with
+            size: Font size, used for line spacing
+            text: Text to measure
         
-        return optimal_size
+        Returns:
+            (width, height) tuple
+        """
+        # 多行文本按 multiline_text 的实际排版整体测量，行间距为字号的20%
+        # （不用 ascent+descent 估算行高：它含行距留白，约为墨迹高度的1.5-2倍）
+        left, top, right, bottom = self._bbox(font, text, int(size * 0.2))
+        return right - left, bottom - top
     
     def create_base_text_image(self, text, style, width, height, fit_text=True, safe_area=None):
         """
@@ -157,9 +260,34 @@ class TextRenderer:
             PIL.Image with rendered text
         """
         # 添加调试信息
-        print(f"[TextRenderer] 创建文本图像: 尺寸={width}x{height}, 安全区域={safe_area}")
+        logger.debug("[TextRenderer] 创建文本图像: 尺寸=%sx%s, 安全区域=%s", width, height, safe_area)
+        
+        # Get base color from style
+        text_color = (255, 255, 255, 255)  # Default white
+        if style and 'text_color' in style:
+            text_color = self.hex_to_rgba(style['text_color'])
+        
+        cache_key = (text, text_color, self.font_path, self.font_size, width, height, fit_text,
+                     tuple(safe_area) if safe_area else None)
+        cached = _base_img_cache.get(cache_key)
+        if cached is not None:
+            _base_img_cache.move_to_end(cache_key)
+            crop, offset, font_size, _ = cached
+            if font_size != self.font_size:
+                self.font_size = font_size
+                self._reload_font()
+            logger.debug("[TextRenderer] 复用缓存的基础文字图，字体大小 %s", font_size)
+            base_img = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+            if crop is not None:
+                base_img.paste(crop, offset)
+            return base_img
+        
+        # 每次渲染重新开始测量缓存（字体可能已更换）
+        self._bbox_cache.clear()
         
         # Create a transparent base image
+        # 画布和 Draw 每次新建：返回的图像就是画布本身，跨调用复用会改写调用方已持有的图像；
+        # 纯测量则共用 _measure_draw
         base_img = Image.new('RGBA', (width, height), (0, 0, 0, 0))
         draw = ImageDraw.Draw(base_img)
         
@@ -171,102 +299,98 @@ class TextRenderer:
             x0, y0, x1, y1 = safe_area
             safe_width = abs(x1 - x0)
             safe_height = abs(y1 - y0)
-            print(f"[TextRenderer] 安全区域大小: {safe_width}x{safe_height}")
+            logger.debug("[TextRenderer] 安全区域大小: %sx%s", safe_width, safe_height)
             
             optimal_size = self.find_optimal_font_size(processed_text, safe_width, safe_height)
-            print(f"[TextRenderer] 计算的最佳字体大小: {optimal_size}")
+            logger.debug("[TextRenderer] 计算的最佳字体大小: %s", optimal_size)
             
             self.font_size = optimal_size
             
             # 当字体大小改变后，需要重新加载字体
-            try:
-                if not self.font_path or not os.path.exists(self.font_path):
-                    # 如果找不到字体文件，使用默认字体
-                    self.font = ImageFont.load_default()
-                else:
-                    self.font = ImageFont.truetype(self.font_path, self.font_size)
-                    print(f"[TextRenderer] 重新加载字体，大小为 {self.font_size}")
-            except Exception as e:
-                print(f"[TextRenderer] 重新加载字体时出错: {e}")
-                self.font = ImageFont.load_default()
-        
-        # Get base color from style
-        text_color = (255, 255, 255, 255)  # Default white
-        if style and 'text_color' in style:
-            text_color = self.hex_to_rgba(style['text_color'])
+            self._reload_font()
         
         # 使用fontbbox信息获取文本位置
         # Calculate text position to center it
         try:
-            # 获取文本尺寸 - 使用适合多行文本的方法
-            if '\n' in processed_text:
-                lines = processed_text.split('\n')
-                text_width = 0
-                text_height = 0
-                
-                # 计算所有行的总高度和最大宽度
-                for line in lines:
-                    bbox = self.font.getbbox(line)
-                    line_width = bbox[2] - bbox[0]
-                    line_height = bbox[3] - bbox[1]
-                    text_width = max(text_width, line_width)
-                    text_height += line_height
-                
-                # 添加行间距
-                line_spacing = int(self.font_size * 0.2)  # 20% of font size
-                text_height += line_spacing * (len(lines) - 1)
-            else:
-                bbox = self.font.getbbox(processed_text)
-                text_width = bbox[2] - bbox[0]
-                text_height = bbox[3] - bbox[1]
+            # 获取文本墨迹范围，多行文本按 multiline_text 的排版整体测量
+            line_spacing = int(self.font_size * 0.2)  # 20% of font size
+            left, top, right, bottom = self._bbox(self.font, processed_text, line_spacing)
+            text_width, text_height = right - left, bottom - top
             
-            print(f"[TextRenderer] 文本尺寸: {text_width}x{text_height}")
+            logger.debug("[TextRenderer] 文本尺寸: %sx%s", text_width, text_height)
             
             # Center text in safe area or whole image
             if safe_area:
                 x0, y0, x1, y1 = safe_area
-                x = x0 + (safe_width - text_width) // 2
-                y = y0 + (safe_height - text_height) // 2
-                print(f"[TextRenderer] 文本位置: ({x}, {y}) (在安全区域内)")
+                x = x0 + (abs(x1 - x0) - text_width) // 2
+                y = y0 + (abs(y1 - y0) - text_height) // 2
+                logger.debug("[TextRenderer] 文本位置: (%s, %s) (在安全区域内)", x, y)
             else:
                 x = (width - text_width) // 2
                 y = (height - text_height) // 2
-                print(f"[TextRenderer] 文本位置: ({x}, {y}) (全图居中)")
+                logger.debug("[TextRenderer] 文本位置: (%s, %s) (全图居中)", x, y)
             
-            # 绘制多行文本
+            # 绘制原点减去墨迹偏移，使墨迹范围（而非字体行框）居中
+            origin = (x - left, y - top)
             if '\n' in processed_text:
-                y_pos = y
-                for line in lines:
-                    bbox = self.font.getbbox(line)
-                    line_width = bbox[2] - bbox[0]
-                    line_height = bbox[3] - bbox[1]
-                    
-                    # 计算行的X坐标（居中对齐）
-                    line_x = x + (text_width - line_width) // 2
-                    
-                    # 绘制当前行
-                    draw.text((line_x, y_pos), line, fill=text_color, font=self.font)
-                    
-                    # 更新Y坐标
-                    y_pos += line_height + line_spacing
+                # 多行文本交给 Pillow 一次排版，各行居中对齐
+                draw.multiline_text(origin, processed_text, fill=text_color, font=self.font,
+                                    align='center', spacing=line_spacing)
             else:
                 # 绘制单行文本
-                draw.text((x, y), processed_text, fill=text_color, font=self.font)
+                draw.text(origin, processed_text, fill=text_color, font=self.font)
         
         except Exception as e:
-            print(f"[TextRenderer] 绘制文本时出错: {e}")
+            logger.warning("[TextRenderer] 绘制文本时出错: %s", e)
             # 出错时使用简单方法绘制
             draw.text((width//4, height//4), processed_text, fill=text_color, font=self.font)
         
+        _cache_base_img(cache_key, base_img, self.font_size)
         return base_img
     
+    def _reload_font(self):
+        """Reload self.font at self.font_size, falling back to the default font."""
+        try:
+            if not self._font_valid:
+                # 如果找不到字体文件，使用默认字体
+                self.font = _default_font()
+            else:
+                self.font = _load_font(self.font_path, self.font_size)
+                logger.debug("[TextRenderer] 重新加载字体，大小为 %s", self.font_size)
+        except Exception as e:
+            logger.warning("[TextRenderer] 重新加载字体时出错: %s", e)
+            self.font = _default_font()
+    
+    def _bbox(self, font, text, spacing=0):
+        """
+        Measure text drawn at the origin, memoized per (font, text, spacing).
+        
+        Single lines use font.getbbox; multi-line text uses multiline_textbbox with
+        the same centre alignment and spacing as the draw call. Fonts come from the
+        _load_font cache, so the font object identifies both path and size.
+        
+        Widths come from the ink bbox rather than font.getlength: advances ignore
+        side bearings, and overhanging glyphs (e.g. Knewave's leading -5 px) would
+        spill past the safe area.
+        """
+        key = (font, text, spacing)
+        bbox = self._bbox_cache.get(key)
+        if bbox is None:
+            if '\n' in text:
+                bbox = _measure_draw().multiline_textbbox((0, 0), text, font=font,
+                                                          spacing=spacing, align='center')
+            else:
+                bbox = font.getbbox(text)
+            bbox = self._bbox_cache[key] = bbox
+        return bbox
+    
     def hex_to_rgba(self, hex_color, alpha=255):
         """Convert hex color to RGBA tuple."""
         hex_color = hex_color.lstrip('#')
         if len(hex_color) == 6:
-            r, g, b = tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
-            return (r, g, b, alpha)
+            v = int(hex_color, 16)
+            return ((v >> 16) & 0xff, (v >> 8) & 0xff, v & 0xff, alpha)
         elif len(hex_color) == 8:
-            r, g, b, a = tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4, 6))
-            return (r, g, b, a)
+            v = int(hex_color, 16)
+            return ((v >> 24) & 0xff, (v >> 16) & 0xff, (v >> 8) & 0xff, v & 0xff)
         return (255, 255, 255, alpha)  # Default white if invalid
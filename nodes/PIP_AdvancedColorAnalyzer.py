@@ -3,9 +3,88 @@ import torch
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 import colorsys
-from collections import Counter
+from functools import lru_cache
 import os
 
+# sklearn为可选依赖，导入结果在模块加载时缓存，避免每次调用都走导入锁
+_SKLEARN_KMEANS = None
+try:
+    from sklearn.cluster import MiniBatchKMeans as _SKLEARN_KMEANS
+except ImportError:
+    pass
+
+# 分析图和配色方案图使用的字体
+_FONT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fonts", "方正风雅宋.ttf")
+
+
+@lru_cache(maxsize=8)
+def _load_font(size):
+    """按字号加载并缓存报告字体，无法加载时使用默认字体"""
+    try:
+        return ImageFont.truetype(_FONT_PATH, size)
+    except Exception:
+        return ImageFont.load_default()
+
+
+def _hues(rgb):
+    """按colorsys.rgb_to_hsv的公式批量计算色相，rgb为取值0-1、形状为(N, 3)的数组"""
+    r, g, b = rgb[:, 0], rgb[:, 1], rgb[:, 2]
+    maxc = rgb.max(axis=1)
+    minc = rgb.min(axis=1)
+    span = np.where(maxc > minc, maxc - minc, 1.0)  # 灰色的色相为0，避免除零
+    rc = (maxc - r) / span
+    gc = (maxc - g) / span
+    bc = (maxc - b) / span
+    h = np.where(r == maxc, bc - gc, np.where(g == maxc, 2.0 + rc - bc, 4.0 + gc - rc))
+    return np.where(maxc > minc, (h / 6.0) % 1.0, 0.0)
+
+
+def _hsv_to_rgb_array(h, s, v):
+    """按colorsys.hsv_to_rgb的公式批量转换，h/s/v为可广播的数组，返回形状为(N, 3)、取值0-1的RGB数组"""
+    h, s, v = np.broadcast_arrays(*[np.asarray(x, dtype=np.float64) for x in (h, s, v)])
+    i = (h * 6.0).astype(int)
+    f = (h * 6.0) - i
+    p = v * (1.0 - s)
+    q = v * (1.0 - s * f)
+    t = v * (1.0 - s * (1.0 - f))
+    i = i % 6
+    r = np.choose(i, [v, q, p, p, t, v])
+    g = np.choose(i, [t, v, v, q, p, p])
+    b = np.choose(i, [p, p, t, v, v, q])
+    return np.stack([r, g, b], axis=-1)
+
+
+@lru_cache(maxsize=64)
+def _saturation_gradient_strip(hue, width, height, value=0.8):
+    """
+    生成固定色相和亮度、饱和度从0线性增加到(width-1)/width的RGB渐变条（uint8数组，形状为height x width x 3）。
+    
+    主导色来自量化后的颜色，色相经常重复，故按参数缓存；返回的数组只读，可在多次调用间共享。
+    """
+    row = (_hsv_to_rgb_array(hue, np.arange(width) / width, value) * 255).astype(np.uint8)
+    return np.broadcast_to(row, (height, width, 3))
+
+
+def _quantized_histogram(arr):
+    """
+    统计RGBA图像中不透明像素（alpha>=10）的量化颜色直方图。
+    
+    每通道量化为5位并打包成15位键。返回 (各键计数, 各键首次出现的像素序号, 不透明像素数)，
+    未出现的键的首次出现序号无意义。
+    """
+    opaque = arr[..., 3] >= 10  # 忽略透明像素
+    q = arr[..., :3][opaque].astype(np.uint16) >> 3
+    keys = (q[:, 0] << 10) | (q[:, 1] << 5) | q[:, 2]
+    count = len(keys)
+    # 键空间只有32768个，直接用bincount得到完整直方图
+    freqs = np.bincount(keys, minlength=1 << 15)
+    # 重复下标的花式索引赋值顺序不确定，用np.unique取每个键最早出现的位置
+    first_seen = np.empty(1 << 15, dtype=np.intp)
+    uniq, idx = np.unique(keys, return_index=True)
+    first_seen[uniq] = idx
+    return freqs, first_seen, count
+
+
 class PIPAdvancedColorAnalyzer:
     """PIP 高级颜色分析节点"""
     
@@ -105,7 +184,9 @@ class PIPAdvancedColorAnalyzer:
     def get_dominant_colors(self, img, sample_points, num_dominant_colors):
         """获取图像中的主导颜色，使用混合采样策略"""
         width, height = img.size
+        # 采样颜色及其权重（样本数），聚类时按权重计算而不复制样本
         pixels = []
+        weights = []
         
         # 第一阶段：使用均匀网格采样
         # 计算网格大小，确保网格数足够密集
@@ -117,100 +198,81 @@ class PIPAdvancedColorAnalyzer:
         
         print(f"采样策略: 均匀网格法, 网格尺寸: {grid_size}x{grid_size}, 块大小: {block_w}x{block_h}")
         
-        # 使用均匀网格采样
-        count = 0
-        color_freq_map = {}  # 用于存储颜色频率
-        
         # 第一阶段：统计图像颜色
         # 1. 将图像缩小以加快处理速度
         scale_factor = max(1, min(width, height) // 200)  # 保证缩小后至少200px
-        small_img = img.resize((width // scale_factor, height // scale_factor), Image.Resampling.LANCZOS)
+        # 只用于统计颜色频率，BOX（区域平均）比LANCZOS快得多且不会产生振铃伪色
+        small_img = img.resize((width // scale_factor, height // scale_factor), Image.Resampling.BOX)
         small_width, small_height = small_img.size
         
         print(f"缩小图像以分析整体颜色分布: {small_width}x{small_height}")
         
-        # 2. 扫描整个缩小后的图像
-        for y in range(small_height):
-            for x in range(small_width):
-                try:
-                    r, g, b, a = small_img.getpixel((x, y))
-                    if a < 10:  # 忽略透明像素
-                        continue
-                    
-                    # 量化颜色 (降低精度来合并相似颜色)
-                    qr = r // 8
-                    qg = g // 8
-                    qb = b // 8
-                    color_key = (qr, qg, qb)
-                    
-                    if color_key in color_freq_map:
-                        color_freq_map[color_key] += 1
-                    else:
-                        color_freq_map[color_key] = 1
-                        
-                    count += 1
-                except:
-                    pass
-        
-        # 3. 按频率排序颜色
-        sorted_colors = sorted(color_freq_map.items(), key=lambda x: x[1], reverse=True)
+        # 2. 扫描整个缩小后的图像，一次性统计量化颜色的频率
+        # 量化颜色 (降低精度来合并相似颜色)，每通道5位打包成一个键
+        freqs, first_seen, count = _quantized_histogram(np.asarray(small_img.convert("RGBA")))
+        
+        # 3. 按频率排序颜色（频率相同时保持首次出现的顺序）
+        present = np.flatnonzero(freqs)
+        top_keys = present[np.lexsort((first_seen[present], -freqs[present]))[:num_dominant_colors * 3]]
+        sorted_colors = [((int(k) >> 10, (int(k) >> 5) & 31, int(k) & 31), int(freqs[k]))
+                         for k in top_keys]
+        
+        # 平面/图形类图像的量化颜色很集中：前k种已覆盖95%以上像素时，
+        # 只合并其中的相似颜色（抗锯齿边缘），跳过后续采样与聚类
+        top_mass = sum(freq for _, freq in sorted_colors[:num_dominant_colors]) / count if count else 0
+        if top_mass > 0.95:
+            print(f"前{num_dominant_colors}种量化颜色覆盖{top_mass * 100:.1f}%的像素，跳过聚类")
+            candidate_colors = [((qr * 8 + 4, qg * 8 + 4, qb * 8 + 4), freq) for (qr, qg, qb), freq in sorted_colors]
+            return self.merge_similar_colors(candidate_colors, num_dominant_colors)
         
         # 4. 转换回RGB空间
         for (qr, qg, qb), freq in sorted_colors[:num_dominant_colors * 3]:
             r = (qr * 8) + 4
             g = (qg * 8) + 4
             b = (qb * 8) + 4
-            # 添加多个样本点，按照频率比例
-            samples_to_add = max(1, int((freq / count) * sample_points))
-            pixels.extend([(r, g, b)] * samples_to_add)
+            # 按照频率比例赋予样本权重
+            pixels.append((r, g, b))
+            weights.append(max(1, int((freq / count) * sample_points)))
         
         # 第二阶段：特定区域精细采样
-        # 使用网格采样获取更多细节
-        grid_samples = []
-        for y in range(0, height, block_h):
-            for x in range(0, width, block_w):
-                if x >= width or y >= height:
-                    continue  # 跳过越界点
-                
-                try:
-                    r, g, b, a = img.getpixel((x, y))
-                    if a < 10:  # 忽略透明像素
-                        continue
-                    grid_samples.append((r, g, b))
-                except:
-                    pass
+        # 使用网格采样获取更多细节：按块大小步进切片整幅图像
+        grid = np.asarray(img.convert("RGBA"))[::block_h, ::block_w]
+        grid_samples = grid[grid[..., 3] >= 10][:, :3]  # 忽略透明像素
         
         # 将网格采样结果添加到像素列表中，赋予一定权重
-        grid_weight = min(1.0, 0.3 * (sample_points / len(grid_samples)) if grid_samples else 0)
+        grid_weight = min(1.0, 0.3 * (sample_points / len(grid_samples)) if len(grid_samples) else 0)
         grid_samples_to_add = int(len(grid_samples) * grid_weight)
         
-        if grid_samples:
-            import random
+        if len(grid_samples):
             # 随机选择一部分网格样本添加到像素列表
-            pixels.extend(random.sample(grid_samples, min(grid_samples_to_add, len(grid_samples))))
+            chosen = np.random.choice(len(grid_samples), min(grid_samples_to_add, len(grid_samples)), replace=False)
+            pixels.extend(map(tuple, grid_samples[chosen].tolist()))
+            weights.extend([1] * len(chosen))
         
-        print(f"总采样点数: {len(pixels)}, 其中频率采样: {len(pixels) - min(grid_samples_to_add, len(grid_samples))}, 网格采样: {min(grid_samples_to_add, len(grid_samples))}")
+        grid_count = min(grid_samples_to_add, len(grid_samples))
+        print(f"总采样点数: {sum(weights)}, 其中频率采样: {sum(weights) - grid_count}, 网格采样: {grid_count}")
         
         if not pixels:
             return [], []
         
+        # 转换为float32数组（默认会得到int64），K-means直接以float32计算，内存访问量减半
+        pixel_array = np.asarray(pixels, dtype=np.float32)
+        weights = np.asarray(weights)
+        
         # 使用K-means聚类找出主导颜色
-        try:
-            import numpy as np
-            from sklearn.cluster import KMeans
-            
-            # 转换为numpy数组
-            pixel_array = np.array(pixels)
-            
-            # 根据颜色数量决定聚类数量
-            n_clusters = min(num_dominant_colors * 2, 8)  # 最多8个聚类
+        if _SKLEARN_KMEANS is not None:
+            # 根据颜色数量决定聚类数量（不能超过不同样本的数量）
+            n_clusters = min(num_dominant_colors * 2, 8, len(pixel_array))  # 最多8个聚类
             
             # 应用K-means聚类
-            kmeans = KMeans(n_clusters=n_clusters, n_init=3, random_state=0)
-            labels = kmeans.fit_predict(pixel_array)
+            # 颜色量化只需近似的聚类中心，小批量K-means（Sculley 2010, "Web-scale k-means clustering"）
+            # 每次迭代只处理一批样本，结果与完整K-means几乎相同但快一个数量级
+            kmeans = _SKLEARN_KMEANS(n_clusters=n_clusters, batch_size=1024, n_init=3, max_iter=50,
+                                      random_state=0, reassignment_ratio=0.01)
+            labels = kmeans.fit_predict(pixel_array, sample_weight=weights)
             
-            # 计算每个聚类的大小
-            cluster_sizes = np.bincount(labels)
+            # 计算每个聚类的大小（样本权重之和）
+            cluster_sizes = np.bincount(labels, weights=weights)
             
             # 获取聚类中心（即主导颜色）
             centers = kmeans.cluster_centers_
@@ -228,67 +290,22 @@ class PIPAdvancedColorAnalyzer:
                 color_counts.append(int(cluster_sizes[idx]))
             
             print("使用K-means聚类结果:")
-        except ImportError:
-            print("无法导入sklearn，退回到传统颜色量化方法")
-            # 使用传统量化方法作为备选
-            # 计算每个量化颜色的频率
-            from collections import Counter
-            quantized_pixels = []
-            for r, g, b in pixels:
-                qr = r // 8  # 约0-31
-                qg = g // 8  # 约0-31
-                qb = b // 8  # 约0-31
-                quantized_pixels.append((qr, qg, qb))
-            
-            color_counter = Counter(quantized_pixels)
-            # 获取最常见的颜色
-            common_colors = color_counter.most_common(num_dominant_colors * 3)
-            
-            # 将量化的颜色转换回RGB
-            candidate_colors = []
-            for (qr, qg, qb), count in common_colors:
-                r = (qr * 8) + 4
-                g = (qg * 8) + 4
-                b = (qb * 8) + 4
-                candidate_colors.append(((r, g, b), count))
+        else:
+            print("无法导入sklearn，退回到八叉树颜色量化方法")
+            # 使用Pillow的快速八叉树量化（C实现）统计采样像素的颜色，代替逐像素的量化计数
+            # 量化器不支持权重，按权重展开样本
+            samples = np.repeat(pixel_array.astype(np.uint8), weights, axis=0)
+            sample_img = Image.fromarray(samples.reshape(1, -1, 3), "RGB")
+            pal_img = sample_img.quantize(colors=num_dominant_colors * 3, method=Image.Quantize.FASTOCTREE)
+            palette = np.asarray(pal_img.getpalette(), dtype=np.int64).reshape(-1, 3)
+            counts = np.bincount(np.asarray(pal_img).ravel(), minlength=len(palette))
+            
+            # 按出现频率从高到低作为候选颜色
+            candidate_colors = [(tuple(palette[i].tolist()), int(counts[i]))
+                                for i in np.argsort(-counts, kind="stable") if counts[i] > 0]
             
             # 合并相似颜色
-            merged_colors = []
-            merged_counts = []
-            
-            # 处理每个候选颜色
-            for color, count in candidate_colors:
-                # 检查这个颜色是否与已经处理过的颜色相似
-                is_similar = False
-                for i, existing_color in enumerate(merged_colors):
-                    distance = self.calculate_color_distance(color, existing_color)
-                    if distance < 25:  # 如果颜色距离小于阈值，认为是相似颜色
-                        # 合并颜色 (加权平均)
-                        total_count = merged_counts[i] + count
-                        weight1 = merged_counts[i] / total_count
-                        weight2 = count / total_count
-                        
-                        r = int(existing_color[0] * weight1 + color[0] * weight2)
-                        g = int(existing_color[1] * weight1 + color[1] * weight2)
-                        b = int(existing_color[2] * weight1 + color[2] * weight2)
-                        
-                        merged_colors[i] = (r, g, b)
-                        merged_counts[i] += count
-                        is_similar = True
-                        break
-                
-                # 如果不相似，添加为新颜色
-                if not is_similar:
-                    merged_colors.append(color)
-                    merged_counts.append(count)
-            
-            # 按出现频率排序
-            sorted_colors = [(color, count) for color, count in zip(merged_colors, merged_counts)]
-            sorted_colors.sort(key=lambda x: x[1], reverse=True)
-            
-            # 限制颜色数量
-            dominant_colors = [color for color, _ in sorted_colors[:num_dominant_colors]]
-            color_counts = [count for _, count in sorted_colors[:num_dominant_colors]]
+            dominant_colors, color_counts = self.merge_similar_colors(candidate_colors, num_dominant_colors)
         
         # 打印调试信息
         print("最终颜色列表:")
@@ -300,6 +317,39 @@ class PIPAdvancedColorAnalyzer:
         
         return dominant_colors, color_counts
         
+    def merge_similar_colors(self, candidate_colors, num_colors):
+        """合并相似的候选颜色，返回按频率排序的前num_colors种颜色及其计数"""
+        merged = np.empty((len(candidate_colors), 3))
+        merged_counts = []
+        
+        # 处理每个候选颜色
+        for color, count in candidate_colors:
+            # 一次计算与所有已合并颜色的距离，取第一个相似的颜色（距离小于阈值）
+            n = len(merged_counts)
+            similar = np.flatnonzero(np.sqrt(((merged[:n] - color) ** 2).sum(axis=1)) < 25)
+            
+            if len(similar):
+                # 合并颜色 (加权平均)
+                i = similar[0]
+                total_count = merged_counts[i] + count
+                merged[i] = (merged[i] * (merged_counts[i] / total_count)
+                             + np.asarray(color) * (count / total_count)).astype(np.int64)
+                merged_counts[i] = total_count
+            else:
+                # 如果不相似，添加为新颜色
+                merged[n] = color
+                merged_counts.append(count)
+        
+        merged_colors = [tuple(c) for c in merged[:len(merged_counts)].astype(int).tolist()]
+        
+        # 按出现频率排序
+        sorted_colors = [(color, count) for color, count in zip(merged_colors, merged_counts)]
+        sorted_colors.sort(key=lambda x: x[1], reverse=True)
+        
+        # 限制颜色数量
+        return ([color for color, _ in sorted_colors[:num_colors]],
+                [count for _, count in sorted_colors[:num_colors]])
+    
     def find_distinct_secondary_color(self, dominant_colors, color_counts, main_color):
         """找到与主导色有足够区分度的辅助色"""
         # 如果只有一个颜色，使用互补色
@@ -326,38 +376,26 @@ class PIPAdvancedColorAnalyzer:
             
             return (r2, g2, b2)
             
-        # 计算每个颜色与主导色的距离
-        distances = []
-        for i, color in enumerate(dominant_colors):
-            if i == 0:  # 跳过主导色自身
-                continue
-            
-            # 计算RGB空间的欧氏距离
-            distance = self.calculate_color_distance(main_color, color)
-            
-            # 转换为HSV计算色相差异
-            r1, g1, b1 = main_color
-            r2, g2, b2 = color
-            h1, s1, v1 = colorsys.rgb_to_hsv(r1/255.0, g1/255.0, b1/255.0)
-            h2, s2, v2 = colorsys.rgb_to_hsv(r2/255.0, g2/255.0, b2/255.0)
-            
-            # 计算色相差异（0-0.5范围）
-            hue_diff = min(abs(h1 - h2), 1 - abs(h1 - h2))
-            
-            # 权重：更重视色相差异，其次是整体距离
-            combined_score = (hue_diff * 200) + distance
-            
-            distances.append((combined_score, color, i))
+        # 一次计算所有候选颜色（跳过主导色自身）与主导色的距离
+        candidates = np.asarray(dominant_colors[1:], dtype=np.float64)
         
-        # 按综合得分排序
-        distances.sort(reverse=True)
+        # 计算RGB空间的欧氏距离
+        distances = np.sqrt(((candidates - main_color) ** 2).sum(axis=1))
+        
+        # 转换为HSV计算色相差异（0-0.5范围）
+        h1 = colorsys.rgb_to_hsv(*[c / 255.0 for c in main_color])[0]
+        hue_diff = np.abs(h1 - _hues(candidates / 255.0))
+        hue_diff = np.minimum(hue_diff, 1 - hue_diff)
+        
+        # 权重：更重视色相差异，其次是整体距离
+        scores = (hue_diff * 200) + distances
+        best = int(np.argmax(scores))
         
         # 检查最高分的颜色是否有足够的区分度
-        if distances and distances[0][0] > 30:
-            selected_color = distances[0][1]
-            selected_idx = distances[0][2]
-            print(f"选择了索引为{selected_idx}的颜色作为辅助色，得分: {distances[0][0]:.1f}")
-            return selected_color
+        if scores[best] > 30:
+            selected_idx = best + 1
+            print(f"选择了索引为{selected_idx}的颜色作为辅助色，得分: {scores[best]:.1f}")
+            return dominant_colors[selected_idx]
             
         # 如果没有足够区分度的颜色，生成一个新的辅助色
         print("无足够区分度的颜色，生成变体作为辅助色")
@@ -381,38 +419,27 @@ class PIPAdvancedColorAnalyzer:
         
         return (r2, g2, b2)
     
-    def calculate_color_distance(self, color1, color2):
-        """计算两个颜色之间的距离"""
-        r1, g1, b1 = color1
-        r2, g2, b2 = color2
-        return ((r1 - r2) ** 2 + (g1 - g2) ** 2 + (b1 - b2) ** 2) ** 0.5
-    
     def calculate_avg_brightness_saturation(self, img, sample_points):
         """计算图像的平均亮度和饱和度"""
         width, height = img.size
-        brightness_sum = 0
-        saturation_sum = 0
-        count = 0
-        
-        import random
-        for _ in range(sample_points):
-            x = random.randint(0, width - 1)
-            y = random.randint(0, height - 1)
-            try:
-                r, g, b, a = img.getpixel((x, y))
-                if a > 10:  # 忽略透明像素
-                    r, g, b = r/255.0, g/255.0, b/255.0
-                    h, s, v = colorsys.rgb_to_hsv(r, g, b)
-                    brightness_sum += v
-                    saturation_sum += s
-                    count += 1
-            except:
-                pass
-        
-        if count == 0:
+        
+        # 一次性随机抽取所有采样点
+        arr = np.asarray(img.convert("RGBA"))
+        ys = np.random.randint(0, height, sample_points)
+        xs = np.random.randint(0, width, sample_points)
+        samples = arr[ys, xs]
+        rgb = samples[samples[:, 3] > 10, :3].astype(np.float64)  # 忽略透明像素
+        
+        if len(rgb) == 0:
             return 0, 0
         
-        return brightness_sum / count, saturation_sum / count
+        # HSV中的V为最大分量，S为(最大-最小)/最大
+        mx = rgb.max(axis=1)
+        mn = rgb.min(axis=1)
+        brightness = mx / 255.0
+        saturation = np.divide(mx - mn, mx, out=np.zeros_like(mx), where=mx > 0)
+        
+        return float(brightness.mean()), float(saturation.mean())
     
     def create_analysis_image(self, main_color, secondary_color, main_percentage, 
                              secondary_percentage, avg_brightness, avg_saturation,
@@ -423,17 +450,10 @@ class PIPAdvancedColorAnalyzer:
         img = Image.new('RGB', (width, height), (255, 255, 255))
         draw = ImageDraw.Draw(img)
         
-        # 尝试加载字体，如果失败则使用默认字体
-        font_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fonts", "方正风雅宋.ttf")
-        try:
-            title_font = ImageFont.truetype(font_path, 28)
-            large_font = ImageFont.truetype(font_path, 20)
-            small_font = ImageFont.truetype(font_path, 16)
-        except:
-            # 如果无法加载字体，使用默认字体
-            title_font = ImageFont.load_default()
-            large_font = ImageFont.load_default()
-            small_font = ImageFont.load_default()
+        # 加载字体（按字号缓存），如果失败则使用默认字体
+        title_font = _load_font(28)
+        large_font = _load_font(20)
+        small_font = _load_font(16)
         
         # 绘制标题
         draw.text((width//2, 30), "颜色分析报告", fill=(0, 0, 0), font=title_font, anchor="mm")
@@ -470,13 +490,9 @@ class PIPAdvancedColorAnalyzer:
         draw.text((50, y_pos), "饱和度:", fill=(0, 0, 0), font=small_font)
         draw.rectangle([(120, y_pos), (700, y_pos+20)], outline=(0, 0, 0))
         
-        # 渐变填充饱和度条
-        for i in range(580):
-            # 创建从灰色到饱和色的渐变
-            saturation = i / 580
-            r, g, b = colorsys.hsv_to_rgb(colorsys.rgb_to_hsv(*[c/255 for c in main_color])[0], saturation, 0.8)
-            draw.line([(120+i, y_pos+1), (120+i, y_pos+19)], 
-                     fill=(int(r*255), int(g*255), int(b*255)))
+        # 渐变填充饱和度条（从灰色到主导色色相的饱和色）
+        hue = colorsys.rgb_to_hsv(*[c/255 for c in main_color])[0]
+        img.paste(Image.fromarray(_saturation_gradient_strip(hue, 580, 19)), (120, y_pos+1))
         
         # 标记当前饱和度位置
         marker_pos = 120 + int(580 * avg_saturation)
@@ -520,13 +536,16 @@ class PIPAdvancedColorAnalyzer:
     
     def tensor2pil(self, image: torch.Tensor) -> Image.Image:
         """Tensor转换为PIL图像"""
-        img = 255. * image.cpu().numpy()[0]
-        img = np.clip(img, 0, 255).astype(np.uint8)
+        # 在张量所在设备上完成缩放、截断和uint8转换，只向CPU拷贝一份uint8数据；
+        # mul返回新张量，clamp_原地修改它不会影响输入
+        img = image[0].mul(255).clamp_(0, 255).to(torch.uint8).cpu().numpy()
         return Image.fromarray(img)
     
     def pil2tensor(self, image: Image.Image) -> torch.Tensor:
         """PIL图像转换为Tensor"""
-        img_np = np.array(image).astype(np.float32) / 255.0
+        # 直接从PIL缓冲区得到float32数组并原地归一化，省去uint8副本和额外的除法数组
+        img_np = np.asarray(image, dtype=np.float32)
+        img_np /= 255.0
         # 添加批次维度并转换为BCHW格式
         img_tensor = torch.from_numpy(img_np).unsqueeze(0)
         # 如果图像是RGB，则转换为CHW格式
@@ -598,26 +617,6 @@ class PIPColorWheel:
         else:
             s_adjusted = s
         
-        # 计算互补色 (对面的颜色，色相差180°)
-        complementary = self.hsv_to_hex((h + 0.5) % 1.0, 
-                                       s_adjusted if is_very_unsaturated else s, 
-                                       v_adjusted if is_very_dark else v)
-        
-        # 计算类似色 (相邻的颜色，色相差30°)
-        analogous = self.hsv_to_hex((h + 0.083) % 1.0, 
-                                   s_adjusted if is_very_unsaturated else s, 
-                                   v_adjusted if is_very_dark else v)
-        
-        # 计算三等分色 (色相差120°)
-        triadic = self.hsv_to_hex((h + 0.333) % 1.0, 
-                                 s_adjusted if is_very_unsaturated else s, 
-                                 v_adjusted if is_very_dark else v)
-        
-        # 计算分裂互补色 (与互补色相邻的颜色，色相差150°)
-        split_complementary = self.hsv_to_hex((h + 0.417) % 1.0, 
-                                             s_adjusted if is_very_unsaturated else s, 
-                                             v_adjusted if is_very_dark else v)
-        
         # 计算单色调 (相同色相，不同饱和度和亮度)
         # 对于黑色或白色，确保单色调有一些可见的变化
         if is_very_dark or is_very_unsaturated:
@@ -626,8 +625,15 @@ class PIPColorWheel:
         else:
             mono_s = max(0.1, s * 0.6)
             mono_v = min(0.95, v * 1.2)
-            
-        monochromatic = self.hsv_to_hex(h, mono_s, mono_v)
+        
+        # 一次换算全部配色：互补色 (色相差180°)、类似色 (30°)、三等分色 (120°)、
+        # 分裂互补色 (150°) 保持饱和度和亮度，单色调保持色相
+        hues = (h + np.array([0.5, 0.083, 0.333, 0.417, 0.0])) % 1.0
+        sats = [s_adjusted] * 4 + [mono_s]
+        vals = [v_adjusted] * 4 + [mono_v]
+        rgb = np.clip((_hsv_to_rgb_array(hues, sats, vals) * 255).astype(int), 0, 255)
+        complementary, analogous, triadic, split_complementary, monochromatic = [
+            f'#{r:02x}{g:02x}{b:02x}' for r, g, b in rgb.tolist()]
         
         # 打印所有生成的颜色，用于调试
         print(f"互补色: {complementary}")
@@ -665,22 +671,6 @@ class PIPColorWheel:
             # 如果转换失败，返回黑色
             return (0, 0, 0)
     
-    def hsv_to_hex(self, h, s, v):
-        """HSV转十六进制"""
-        try:
-            r, g, b = colorsys.hsv_to_rgb(h, s, v)
-            # 将[0,1]的RGB值转换为[0,255]的整数RGB值
-            r, g, b = [int(c * 255) for c in [r, g, b]]
-            # 确保RGB值在有效范围内
-            r = max(0, min(255, r))
-            g = max(0, min(255, g))
-            b = max(0, min(255, b))
-            # 转换为十六进制
-            return f'#{r:02x}{g:02x}{b:02x}'
-        except Exception as e:
-            print(f"HSV转HEX错误: {e}, 输入HSV: {h}, {s}, {v}")
-            return '#000000'  # 错误时返回黑色
-        
     def create_color_image(self, input_color, complementary, analogous, triadic, split_complementary, monochromatic):
         """创建颜色图"""
         # 创建一个白色背景的图像
@@ -688,15 +678,9 @@ class PIPColorWheel:
         img = Image.new('RGB', (width, height), (255, 255, 255))
         draw = ImageDraw.Draw(img)
         
-        # 尝试加载字体
-        font_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fonts", "方正风雅宋.ttf")
-        try:
-            title_font = ImageFont.truetype(font_path, 28)
-            color_font = ImageFont.truetype(font_path, 20)
-        except:
-            # 如果无法加载字体，使用默认字体
-            title_font = ImageFont.load_default()
-            color_font = ImageFont.load_default()
+        # 加载字体（按字号缓存），如果失败则使用默认字体
+        title_font = _load_font(28)
+        color_font = _load_font(20)
         
         # 绘制标题
         draw.text((width//2, 40), "色轮配色", fill=(0, 0, 0), font=title_font, anchor="mm")
@@ -767,7 +751,9 @@ class PIPColorWheel:
     
     def pil2tensor(self, image: Image.Image) -> torch.Tensor:
         """PIL图像转换为Tensor"""
-        img_np = np.array(image).astype(np.float32) / 255.0
+        # 直接从PIL缓冲区得到float32数组并原地归一化，省去uint8副本和额外的除法数组
+        img_np = np.asarray(image, dtype=np.float32)
+        img_np /= 255.0
         # 添加批次维度并转换为BCHW格式
         img_tensor = torch.from_numpy(img_np).unsqueeze(0)
         # 如果图像是RGB，则转换为CHW格式
@@ -2,7 +2,6 @@ import comfy
 import torch
 import numpy as np
 from PIL import Image
-import colorsys
 
 class PIPColorPicker:
     """PIP 颜色拾取节点（修复越界问题版）"""
@@ -44,66 +43,43 @@ class PIPColorPicker:
         fill_color = self.adjust_brightness(avg_color, 0.3)
         shadow_color = self.adjust_brightness(avg_color, -0.3)
         
-        return (
-            self.rgb_to_hex(fill_color),
-            self.rgb_to_hex(avg_color),
-            self.rgb_to_hex(shadow_color)
-        )
+        # 三个颜色的9个通道值一次转成十六进制字符串，再按每色6位切分
+        hx = np.array([fill_color, avg_color, shadow_color], dtype=np.uint8).tobytes().hex()
+        return ("#" + hx[0:6], "#" + hx[6:12], "#" + hx[12:18])
 
     def tensor2pil(self, image: torch.Tensor) -> Image.Image:
         """修复Tensor转换问题"""
-        img = 255. * image.cpu().numpy()[0]
-        img = np.clip(img, 0, 255).astype(np.uint8)
+        # 在torch侧完成缩放和截断并直接转为uint8，避免生成整幅float64中间数组
+        img = image[0].mul(255).clamp_(0, 255).to(torch.uint8).cpu().numpy()
         return Image.fromarray(img)
 
     def get_average_color(self, img: Image.Image, grid_blocks: int) -> tuple:
-        """动态计算步长，避免越界"""
+        """将图像按网格分块求平均（BOX缩小到每块一个像素），再对不透明的块求平均颜色"""
         width, height = img.size
-        block_w = max(1, width // grid_blocks)
-        block_h = max(1, height // grid_blocks)
+        grid_w = min(grid_blocks, width)
+        grid_h = min(grid_blocks, height)
         
-        total_r = total_g = total_b = count = 0
+        # BOX缩放对每个网格块内的全部像素求平均（RGBA按预乘alpha计算，透明像素不影响颜色），
+        # 比在原图上稀疏取点更能代表整体颜色，且只需一次C实现的遍历
+        blocks = np.asarray(img.resize((grid_w, grid_h), Image.BOX))
+        opaque = blocks[..., :3][blocks[..., 3] >= 10]
         
-        for y in range(0, height, block_h):
-            for x in range(0, width, block_w):
-                if x >= width or y >= height:
-                    continue  # 跳过越界点
-                try:
-                    r, g, b, a = img.getpixel((x, y))
-                    if a < 10:
-                        continue
-                    total_r += r
-                    total_g += g
-                    total_b += b
-                    count += 1
-                except:
-                    pass
-        
-        if count == 0:
+        if len(opaque) == 0:
             return None
         
-        return (
-            int(total_r / count),
-            int(total_g / count),
-            int(total_b / count)
-        )
+        r, g, b = opaque.mean(axis=0)
+        return (int(r), int(g), int(b))
 
-    # 新增缺失的两个方法
+    # 新增缺失的方法
     def adjust_brightness(self, rgb: tuple, delta: float) -> tuple:
-        """通过 HSV 调整亮度"""
-        r, g, b = [x / 255.0 for x in rgb]
-        h, s, v = colorsys.rgb_to_hsv(r, g, b)
-        v = max(0.0, min(1.0, v + delta))
-        new_r, new_g, new_b = colorsys.hsv_to_rgb(h, s, v)
-        return (
-            int(new_r * 255),
-            int(new_g * 255),
-            int(new_b * 255)
-        )
-
-    def rgb_to_hex(self, rgb: tuple) -> str:
-        """RGB转十六进制"""
-        return "#{:02x}{:02x}{:02x}".format(rgb[0], rgb[1], rgb[2])
+        """通过 HSV 调整亮度（只改变V，色相和饱和度不变，等价于按比例缩放RGB三通道）"""
+        mx = max(rgb)
+        v = max(0.0, min(1.0, mx / 255.0 + delta))
+        if mx == 0:
+            # 纯黑没有色相，调整后为灰色
+            c = int(v * 255)
+            return (c, c, c)
+        return tuple(int(c / mx * v * 255) for c in rgb)
 
 # 节点注册
 NODE_CLASS_MAPPINGS = {
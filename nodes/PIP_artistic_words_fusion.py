@@ -1,21 +1,32 @@
 import numpy as np
 import torch
-from PIL import Image, ImageChops
 
 from ..core.effects_processor import EffectsProcessor
 from ..core.text_renderer import TextRenderer
-from ..utils.tensor_utils import pil_to_tensor, tensor_to_pil
+from ..utils.font_manager import FontManager
+from ..utils.tensor_utils import array_to_tensor, tensor_to_pil
 
 
 class PIPArtisticWordsFusion:
     """PIP艺术字融合节点，允许设计师在图像上添加艺术字效果"""
     
+    # 字体管理器在类级别共享：加载节点定义时重新扫描字体目录，执行时直接复用扫描结果
+    _font_manager = None
+    # 特效处理器无状态，按是否输出调试图像各保留一个实例
+    _effects_processors = {}
+    
+    @classmethod
+    def _get_font_manager(cls):
+        """获取共享的字体管理器，尚未创建时扫描一次字体目录"""
+        if cls._font_manager is None:
+            cls._font_manager = FontManager()
+        return cls._font_manager
+    
     @classmethod
     def INPUT_TYPES(cls):
-        # 获取可用字体
-        from ..utils.font_manager import FontManager
-        font_manager = FontManager()
-        available_fonts = font_manager.get_available_fonts()
+        # 获取可用字体（重新扫描，使新放入fonts目录的字体出现在列表中）
+        cls._font_manager = FontManager()
+        available_fonts = cls._font_manager.get_available_fonts()
         
         return {
             "required": {
@@ -64,6 +75,38 @@ class PIPArtisticWordsFusion:
             }
         }
     
+    # 参数名称映射表（中文到英文）
+    _PARAM_MAP = {
+        "上边距比例": "margin_top",
+        "下边距比例": "margin_bottom",
+        "左边距比例": "margin_left",
+        "右边距比例": "margin_right",
+        
+        "启用填充": "enable_fill",
+        "填充颜色": "fill_color",
+        
+        "启用描边": "outline_enabled",
+        "描边宽度": "outline_width",
+        "描边透明度": "outline_opacity",
+        "描边颜色": "outline_color",
+        
+        "启用阴影": "shadow_enabled",
+        "阴影颜色": "shadow_color",
+        "阴影透明度": "shadow_opacity",
+        "阴影X偏移": "shadow_offset_x",
+        "阴影Y偏移": "shadow_offset_y",
+        "阴影模糊": "shadow_blur",
+        
+        "启用内阴影": "inner_shadow_enabled",
+        "内阴影颜色": "inner_shadow_color",
+        "内阴影透明度": "inner_shadow_opacity",
+        "内阴影X偏移": "inner_shadow_offset_x",
+        "内阴影Y偏移": "inner_shadow_offset_y",
+        "内阴影模糊": "inner_shadow_blur",
+        
+        "文字透明度": "text_opacity",
+    }
+    
     RETURN_TYPES = ("IMAGE", "STRING")
     RETURN_NAMES = ("融合图像", "信息")
     FUNCTION = "process"
@@ -78,59 +121,16 @@ class PIPArtisticWordsFusion:
         # 获取调试模式
         debug_info = kwargs.get("显示调试信息", "none")
         
-        # 获取图像尺寸
-        if len(image.shape) == 4:  # BHWC
-            height = image.shape[1]
-            width = image.shape[2]
-        else:
-            height = image.shape[0]
-            width = image.shape[1]
-        
         # 添加输入图像形状信息
-        print(f"[PIP艺术字融合节点] 输入图像形状: {image.shape}")
+        if debug_info != "none":
+            print(f"[PIP艺术字融合节点] 输入图像形状: {image.shape}")
         
         # 转换tensor到PIL图像用于处理
         pil_image = tensor_to_pil(image)
         width, height = pil_image.size
         
-        # 参数名称映射表（中文到英文）
-        param_map = {
-            "上边距比例": "margin_top",
-            "下边距比例": "margin_bottom",
-            "左边距比例": "margin_left",
-            "右边距比例": "margin_right",
-            
-            "启用填充": "enable_fill",
-            "填充颜色": "fill_color",
-            
-            "启用描边": "outline_enabled",
-            "描边宽度": "outline_width",
-            "描边透明度": "outline_opacity",
-            "描边颜色": "outline_color",
-            
-            "启用阴影": "shadow_enabled",
-            "阴影颜色": "shadow_color",
-            "阴影透明度": "shadow_opacity",
-            "阴影X偏移": "shadow_offset_x",
-            "阴影Y偏移": "shadow_offset_y",
-            "阴影模糊": "shadow_blur",
-            
-            "启用内阴影": "inner_shadow_enabled",
-            "内阴影颜色": "inner_shadow_color",
-            "内阴影透明度": "inner_shadow_opacity",
-            "内阴影X偏移": "inner_shadow_offset_x",
-            "内阴影Y偏移": "inner_shadow_offset_y",
-            "内阴影模糊": "inner_shadow_blur",
-            
-            "文字透明度": "text_opacity",
-        }
-        
         # 转换中文参数到英文参数
-        english_params = {}
-        for zh_key, value in kwargs.items():
-            if zh_key in param_map:
-                en_key = param_map[zh_key]
-                english_params[en_key] = value
+        english_params = {self._PARAM_MAP[k]: v for k, v in kwargs.items() if k in self._PARAM_MAP}
         
         # 获取边距设置
         margin_top = english_params.get('margin_top', 0.63)
@@ -141,9 +141,6 @@ class PIPArtisticWordsFusion:
         # 构建样式字典
         style = self._build_style_dict(english_params)
         
-        # 添加调试信息
-        print(f"[PIP艺术字融合节点] 使用字体: {font_name}")
-        
         # 内阴影调试
         if debug_info == "detailed" and 'inner_shadow' in style:
             inner_shadow = style['inner_shadow']
@@ -154,7 +151,10 @@ class PIPArtisticWordsFusion:
             print(f"[PIP艺术字融合节点-内阴影] 模糊: {inner_shadow.get('blur')}")
         
         # 创建特效处理器
-        effects_processor = EffectsProcessor(debug_output=(debug_info == "detailed"))
+        debug_output = debug_info == "detailed"
+        effects_processor = self._effects_processors.get(debug_output)
+        if effects_processor is None:
+            effects_processor = self._effects_processors[debug_output] = EffectsProcessor(debug_output=debug_output)
         
         # 计算安全区域
         left = int(width * margin_left)
@@ -165,6 +165,7 @@ class PIPArtisticWordsFusion:
         
         # 打印安全区域信息
         if debug_info != "none":
+            print(f"[PIP艺术字融合节点] 使用字体: {font_name}")
             print(f"[PIP艺术字融合节点] 图像尺寸: {width}x{height}")
             print(f"[PIP艺术字融合节点] 安全区域: {safe_area}")
             print(f"[PIP艺术字融合节点] 边距: 上: {margin_top*100:.1f}%, 下: {margin_bottom*100:.1f}%, 左: {margin_left*100:.1f}%, 右: {margin_right*100:.1f}%")
@@ -174,9 +175,7 @@ class PIPArtisticWordsFusion:
             print(f"[PIP艺术字融合节点] 安全区域尺寸: {safe_width}x{safe_height}")
         
         # 创建文本渲染器
-        from ..utils.font_manager import FontManager
-        font_manager = FontManager()
-        font_path = font_manager.get_font_path(font_name)
+        font_path = self._get_font_manager().get_font_path(font_name)
         
         # 根据安全区域确定合适的字体大小
         font_size = 100  # 初始字体大小
@@ -198,94 +197,107 @@ class PIPArtisticWordsFusion:
         if debug_info == "detailed":
             print(f"[PIP艺术字融合节点] 应用效果前字体大小: {text_renderer.font_size}")
             print(f"[PIP艺术字融合节点] 样式效果: {[k for k in style.keys() if k in ['outline', 'shadow', 'fill', 'inner_shadow']]}")
-            
-            # 内阴影调试
-            if 'inner_shadow' in style:
-                inner_shadow = style['inner_shadow']
-                print(f"\n[PIP艺术字融合节点-内阴影] 颜色: {inner_shadow.get('color')}")
-                print(f"[PIP艺术字融合节点-内阴影] 不透明度: {inner_shadow.get('opacity')}")
-                print(f"[PIP艺术字融合节点-内阴影] X偏移: {inner_shadow.get('offset_x')}")
-                print(f"[PIP艺术字融合节点-内阴影] Y偏移: {inner_shadow.get('offset_y')}")
-                print(f"[PIP艺术字融合节点-内阴影] 模糊: {inner_shadow.get('blur')}")
         
         styled_text_result = effects_processor.apply_all_effects(base_text_image, style, style_name="pip_artistic_words")
         
         # 修复: apply_all_effects 返回 (image, layers) 元组，我们只需要第一个元素
         if isinstance(styled_text_result, tuple) and len(styled_text_result) >= 1:
             styled_text_image = styled_text_result[0]  # 获取结果图像
-            print("[PIP艺术字融合节点] 成功从apply_all_effects获取结果图像")
+            if debug_info != "none":
+                print("[PIP艺术字融合节点] 成功从apply_all_effects获取结果图像")
         else:
             styled_text_image = styled_text_result  # 如果不是元组，直接使用
         
-        # 创建一个新的透明图像作为结果
-        result_image = Image.new('RGBA', pil_image.size, (0, 0, 0, 0))
+        # 原图由 tensor_to_pil 或 convert 新建，为本次调用私有，直接在其上合成（输入已是RGBA时不必再转换）
+        result_image = pil_image if pil_image.mode == 'RGBA' else pil_image.convert('RGBA')
         
-        # 把原始图像粘贴到结果图上
-        pil_image_rgba = pil_image.convert('RGBA')
-        result_image.paste(pil_image_rgba, (0, 0))
+        # 文字透明度处理需要原图的alpha，仅在该情况下于合成前保存一份
+        text_opacity = english_params.get('text_opacity', 1.0)
+        original_alpha = np.asarray(result_image)[..., 3].copy() if text_opacity < 1.0 else None
         
         # 使用alpha_composite方法合成，这会保留所有特效
-        result_image = Image.alpha_composite(result_image, styled_text_image)
+        # 文字层通常只占安全区域内的一小块，只合成其不透明区域的包围盒；全透明时无需合成
+        text_bbox = styled_text_image.getbbox()
+        if text_bbox:
+            result_image.alpha_composite(styled_text_image, dest=text_bbox[:2], source=text_bbox)
         
         # 应用文字透明度设置
-        text_opacity = english_params.get('text_opacity', 1.0)
-        if text_opacity < 1.0:
-            # 从结果图像中分离出添加了文字的部分
-            r, g, b, a = result_image.split()
-            # 调整透明度，但仅对添加的文字部分生效
-            original_alpha = pil_image_rgba.split()[3]
-            # 创建一个掩码，标记出文字添加的位置
-            text_mask = Image.eval(ImageChops.subtract(a, original_alpha), lambda x: x if x > 0 else 0)
-            # 按照文字透明度调整这个掩码
-            adjusted_mask = text_mask.point(lambda x: int(x * text_opacity))
-            # 合成新的alpha通道
-            final_alpha = ImageChops.add(original_alpha, adjusted_mask)
-            # 合成最终图像
-            result_image = Image.merge('RGBA', (r, g, b, final_alpha))
-        
-        # 转换回张量 (BHWC 格式)
-        result_tensor = pil_to_tensor(result_image)
+        if original_alpha is not None:
+            # 仅对添加的文字部分调整透明度：文字带来的alpha增量按透明度缩放后加回原图alpha
+            result_arr = np.array(result_image)
+            text_alpha = np.subtract(result_arr[..., 3], original_alpha, dtype=np.int16).clip(0)
+            # 查找表与逐值 int(x * text_opacity) 的结果一致
+            opacity_lut = (np.arange(256) * text_opacity).astype(np.int16)
+            result_arr[..., 3] = np.minimum(original_alpha + opacity_lut[text_alpha], 255)
+        else:
+            result_arr = np.asarray(result_image)
+        
+        # 转换回张量 (BHWC 格式)，直接由数组构建，不再重新生成PIL图像
+        result_tensor = array_to_tensor(result_arr)
         
         # 创建详细的信息字符串
-        info = f"文本: {text}\n字体: {font_name} (大小: {text_renderer.font_size}pt)\n"
+        parts = [f"文本: {text}\n字体: {font_name} (大小: {text_renderer.font_size}pt)\n"]
         
         # 添加填充信息
+        parts.append("\n【填充】\n")
         if english_params.get("enable_fill", True):
-            info += f"\n【填充】\n"
-            info += f"颜色: {kwargs.get('填充颜色', '#4096FF')}\n"
+            parts.append(f"颜色: {kwargs.get('填充颜色', '#4096FF')}\n")
         else:
-            info += f"\n【填充】\n已禁用\n"
+            parts.append("已禁用\n")
         
         # 添加描边信息
+        parts.append("\n【描边】\n")
         if english_params.get("outline_enabled", True):
-            info += f"\n【描边】\n宽度: {kwargs.get('描边宽度', 5)}\n"
-            info += f"透明度: {kwargs.get('描边透明度', 1.0)}\n"
-            info += f"颜色: {kwargs.get('描边颜色', '#000000')}\n"
+            parts.append(f"宽度: {kwargs.get('描边宽度', 5)}\n"
+                         f"透明度: {kwargs.get('描边透明度', 1.0)}\n"
+                         f"颜色: {kwargs.get('描边颜色', '#000000')}\n")
         else:
-            info += f"\n【描边】\n已禁用\n"
+            parts.append("已禁用\n")
         
         # 添加阴影信息
+        parts.append("\n【阴影】\n")
         if english_params.get("shadow_enabled", True):
-            info += f"\n【阴影】\n"
-            info += f"颜色: {kwargs.get('阴影颜色', '#000000')}\n"
-            info += f"透明度: {kwargs.get('阴影透明度', 0.6)}\n"
-            info += f"偏移: X={kwargs.get('阴影X偏移', 5)}, Y={kwargs.get('阴影Y偏移', 5)}\n"
-            info += f"模糊: {kwargs.get('阴影模糊', 10)}\n"
+            parts.append(f"颜色: {kwargs.get('阴影颜色', '#000000')}\n"
+                         f"透明度: {kwargs.get('阴影透明度', 0.6)}\n"
+                         f"偏移: X={kwargs.get('阴影X偏移', 5)}, Y={kwargs.get('阴影Y偏移', 5)}\n"
+                         f"模糊: {kwargs.get('阴影模糊', 10)}\n")
         else:
-            info += f"\n【阴影】\n已禁用\n"
+            parts.append("已禁用\n")
         
         # 添加内阴影信息
+        parts.append("\n【内阴影】\n")
         if english_params.get("inner_shadow_enabled", False):
-            info += f"\n【内阴影】\n"
-            info += f"颜色: {kwargs.get('内阴影颜色', '#FFFFFF')}\n"
-            info += f"透明度: {kwargs.get('内阴影透明度', 0.7)}\n"
-            info += f"偏移: X={kwargs.get('内阴影X偏移', 2)}, Y={kwargs.get('内阴影Y偏移', 2)}\n"
-            info += f"模糊: {kwargs.get('内阴影模糊', 2)}\n"
+            parts.append(f"颜色: {kwargs.get('内阴影颜色', '#FFFFFF')}\n"
+                         f"透明度: {kwargs.get('内阴影透明度', 0.7)}\n"
+                         f"偏移: X={kwargs.get('内阴影X偏移', 2)}, Y={kwargs.get('内阴影Y偏移', 2)}\n"
+                         f"模糊: {kwargs.get('内阴影模糊', 2)}\n")
         else:
-            info += f"\n【内阴影】\n已禁用\n"
+            parts.append("已禁用\n")
+        
+        info = "".join(parts)
         
         return (result_tensor, info)
     
+    # 各效果参数的默认值（键为去掉效果前缀后的参数名，顺序即样式字典中的顺序）
+    _SHADOW_DEFAULTS = {'color': '#000000', 'opacity': 0.6, 'offset_x': 5, 'offset_y': 5, 'blur': 10}
+    _OUTLINE_DEFAULTS = {'width': 5, 'opacity': 1.0, 'color': '#000000'}
+    _INNER_SHADOW_DEFAULTS = {'color': '#FFFFFF', 'opacity': 0.7, 'offset_x': 2, 'offset_y': 2, 'blur': 2}  # 默认改为白色
+    
+    @staticmethod
+    def _effect_params(params, prefix, defaults):
+        """按默认值表取出某个效果的全部参数"""
+        return {k: params.get(prefix + k, v) for k, v in defaults.items()}
+    
+    @classmethod
+    def _shadow_params(cls, params, prefix, defaults):
+        """取出投影/内阴影参数，并统一转换数值类型"""
+        shadow = cls._effect_params(params, prefix, defaults)
+        shadow['opacity'] = float(shadow['opacity'])
+        shadow['offset_x'] = int(shadow['offset_x'])
+        shadow['offset_y'] = int(shadow['offset_y'])
+        shadow['blur'] = int(shadow['blur'])
+        return shadow
+    
     def _build_style_dict(self, params):
         """根据UI参数构建样式字典"""
         style = {}
@@ -296,25 +308,12 @@ class PIPArtisticWordsFusion:
         
         # 添加阴影（最底层）
         if params.get('shadow_enabled', True):
-            style['shadow'] = {
-                'color': params.get('shadow_color', '#000000'),
-                'opacity': float(params.get('shadow_opacity', 0.6)),
-                'offset_x': int(params.get('shadow_offset_x', 5)),
-                'offset_y': int(params.get('shadow_offset_y', 5)),
-                'blur': int(params.get('shadow_blur', 10))
-            }
+            style['shadow'] = self._shadow_params(params, 'shadow_', self._SHADOW_DEFAULTS)
             style['_effects_order'].append('shadow')
             
         # 添加描边（中间层）
         if params.get('outline_enabled', True):
-            outline_width = params.get('outline_width', 5)
-            outline_opacity = params.get('outline_opacity', 1.0)
-            
-            style['outline'] = {
-                'width': outline_width,
-                'opacity': outline_opacity,
-                'color': params.get('outline_color', '#000000')
-            }
+            style['outline'] = self._effect_params(params, 'outline_', self._OUTLINE_DEFAULTS)
             style['_effects_order'].append('outline')
         
         # 添加填充（最上层，确保在描边之上）
@@ -328,13 +327,7 @@ class PIPArtisticWordsFusion:
                 
         # 内阴影（最后添加）
         if params.get('inner_shadow_enabled', False):
-            style['inner_shadow'] = {
-                'color': params.get('inner_shadow_color', '#FFFFFF'),  # 默认改为白色
-                'opacity': float(params.get('inner_shadow_opacity', 0.7)),
-                'offset_x': int(params.get('inner_shadow_offset_x', 2)),
-                'offset_y': int(params.get('inner_shadow_offset_y', 2)),
-                'blur': int(params.get('inner_shadow_blur', 2))
-            }
+            style['inner_shadow'] = self._shadow_params(params, 'inner_shadow_', self._INNER_SHADOW_DEFAULTS)
             style['_effects_order'].append('inner_shadow')
         
         return style
@@ -345,10 +338,11 @@ class PIPArtisticWordsFusion:
             return (255, 255, 255, alpha)
         
         hex_color = hex_color.lstrip('#')
+        # 整串只解析一次，再按位取出各通道
         if len(hex_color) == 6:
-            r, g, b = tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
-            return (r, g, b, alpha)
+            v = int(hex_color, 16)
+            return ((v >> 16) & 0xff, (v >> 8) & 0xff, v & 0xff, alpha)
         elif len(hex_color) == 8:
-            r, g, b, a = tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4, 6))
-            return (r, g, b, a)
+            v = int(hex_color, 16)
+            return ((v >> 24) & 0xff, (v >> 16) & 0xff, (v >> 8) & 0xff, v & 0xff)
         return (255, 255, 255, alpha)
@@ -9,13 +9,53 @@ from ..core.style_manager import StyleManager
 from ..core.text_renderer import TextRenderer
 from ..core.effects_processor import EffectsProcessor
 from ..core.style_color_manager import StyleColorManager
-from ..utils.tensor_utils import tensor_to_pil, pil_to_tensor, create_alpha_mask
+from ..utils.tensor_utils import tensor_to_pil, tensor_to_rgba_pil, array_to_tensor, create_alpha_mask
 from ..utils.font_manager import FontManager
 
 
 class ArtisticTextNode:
     """Node for generating artistic text overlayed on images in ComfyUI."""
     
+    # 样式和字体管理器在类级别共享，首次使用时才读取样式文件和扫描字体目录
+    _style_manager = None
+    _font_manager = None
+    # 特效处理器无状态、颜色样式管理器只在初始化时读取映射配置，同样在各次调用间共享
+    _effects_processor = None
+    _style_color_manager = None
+    # 透明度 -> alpha查找表，同一透明度只计算一次
+    _opacity_lut_cache = {}
+    
+    @classmethod
+    def _get_managers(cls):
+        """获取共享的样式管理器和字体管理器"""
+        if cls._style_manager is None:
+            cls._style_manager = StyleManager(verbose=False)
+        if cls._font_manager is None:
+            cls._font_manager = FontManager()
+        return cls._style_manager, cls._font_manager
+    
+    @classmethod
+    def _opacity_lut(cls, opacity):
+        """获取透明度查找表，第i项为 int(i * opacity)"""
+        lut = cls._opacity_lut_cache.get(opacity)
+        if lut is None:
+            lut = cls._opacity_lut_cache[opacity] = (np.arange(256) * opacity).astype(np.uint8)
+        return lut
+    
+    @classmethod
+    def _get_effects_processor(cls):
+        """获取共享的特效处理器"""
+        if cls._effects_processor is None:
+            cls._effects_processor = EffectsProcessor(debug_output=False)
+        return cls._effects_processor
+    
+    @classmethod
+    def _get_style_color_manager(cls):
+        """获取共享的颜色样式管理器（颜色映射配置只读取一次）"""
+        if cls._style_color_manager is None:
+            cls._style_color_manager = StyleColorManager()
+        return cls._style_color_manager
+    
     @classmethod
     def INPUT_TYPES(cls):
         # Get available styles
@@ -46,6 +86,9 @@ class ArtisticTextNode:
     FUNCTION = "generate_artistic_text"
     CATEGORY = "PIP"
     
+    # debug_info选项对应的调试级别
+    _DEBUG_LEVELS = {"none": 0, "basic": 1, "detailed": 2}
+    
     def generate_artistic_text(self, image, text, seed, style="random", color_match="disable",
                                margin_top=0.25, margin_bottom=0.15, margin_left=0.1, margin_right=0.1,
                                opacity=1.0, debug_info="none"):
@@ -66,11 +109,16 @@ class ArtisticTextNode:
             debug_info: Print debug information (none, basic, detailed)
         
         Returns:
-            Image tensor with text overlayed
+            Image tensor with text overlayed on every image of the batch. The style
+            and text layer are chosen/rendered once (color matching uses the first
+            image) and composited onto each frame.
         """
         # Set random seed for reproducibility
         random.seed(seed)
         
+        # Debug level computed once: 0 = none, 1 = basic, 2 = detailed
+        debug_lvl = self._DEBUG_LEVELS.get(debug_info, 0)
+        
         # Get image dimensions
         if len(image.shape) == 4:  # BHWC
             height = image.shape[1]
@@ -80,16 +128,15 @@ class ArtisticTextNode:
             width = image.shape[1]
         
         # 添加输入图像形状信息
-        print(f"[PIP_ArtisticWords] 输入图像形状: {image.shape}")
+        if debug_lvl:
+            print(f"[PIP_ArtisticWords] 输入图像形状: {image.shape}")
         
-        # Create style manager and load styles/fonts
-        from ..core.style_manager import StyleManager
-        style_manager = StyleManager(verbose=False)
-        font_manager = FontManager()
+        # Get the shared style/font managers (styles and fonts are loaded once)
+        style_manager, font_manager = self._get_managers()
         
-        # Convert tensor to PIL image for processing (need it early for color analysis)
-        pil_image = tensor_to_pil(image)
-        width, height = pil_image.size
+        # The PIL image is only needed for color analysis and the final composite;
+        # convert lazily (at most once) and use the tensor shape for dimensions
+        pil_image = None
         
         # 根据color_match参数决定是否使用颜色匹配功能
         selected_style_name = style
@@ -97,29 +144,31 @@ class ArtisticTextNode:
         dominant_color_rgb = None
         
         if color_match == "enable" and style == "random":
-            # 创建颜色样式管理器
-            style_color_manager = StyleColorManager()
+            # 获取颜色样式管理器
+            style_color_manager = self._get_style_color_manager()
             
             # 分析图像颜色并获取匹配的样式
-            matched_style, color_name, color_rgb, confidence = style_color_manager.get_style_for_image(pil_image)
+            # 主色分析只需要颜色分布，在128x128以内的缩略图上进行即可（分析器本身还会再缩小到约1000像素）
+            pil_image = tensor_to_pil(image)
+            analysis_image = pil_image.copy()
+            analysis_image.thumbnail((128, 128), Image.BILINEAR)
+            matched_style, color_name, color_rgb, confidence = style_color_manager.get_style_for_image(analysis_image)
             
             if matched_style:
                 selected_style_name = matched_style
                 dominant_color_name = color_name
                 dominant_color_rgb = color_rgb
                 
-                if debug_info != "none":
+                if debug_lvl:
                     print(f"[PIP_ArtisticWords] 颜色匹配启用: 检测到主色调 {color_name} ({color_rgb})")
                     print(f"[PIP_ArtisticWords] 匹配样式: {matched_style} (置信度: {confidence:.2f})")
         
         # 获取样式和字体
         if selected_style_name == "random":
-            style_data, font_name = style_manager.generate_random_combination()
-            # Get the actual style name that was randomly selected
-            for style_name, style_content in style_manager.styles.items():
-                if style_content == style_data:
-                    selected_style_name = style_name
-                    break
+            # Also get the actual style name that was randomly selected
+            random_style_name, style_data, font_name = style_manager.generate_random_combination_named()
+            if random_style_name is not None:
+                selected_style_name = random_style_name
         else:
             style_data = style_manager.get_style(selected_style_name)
             # 选择字体: 与Preview节点保持一致，使用相同逻辑
@@ -138,12 +187,12 @@ class ArtisticTextNode:
                 font_name = random.choice(font_manager.get_available_fonts())
         
         # Print debug information
-        if debug_info != "none":
+        if debug_lvl:
             print(f"[PIP_ArtisticWords] Selected style: {selected_style_name}")
             print(f"[PIP_ArtisticWords] Selected font: {font_name}")
             print(f"[PIP_ArtisticWords] Seed: {seed}")
             
-            if debug_info == "detailed":
+            if debug_lvl >= 2:
                 print(f"[PIP_ArtisticWords] Style data: {style_data}")
         
         # Get font path
@@ -156,21 +205,7 @@ class ArtisticTextNode:
         bottom = height - int(height * margin_bottom)
         safe_area = (left, top, right, bottom)
         
-        # 检测样式中是否有发光效果
-        has_glow = False
-        if 'glow' in style_data:
-            # 只有当glow的radius和intensity都大于0时才算有发光效果
-            glow = style_data['glow']
-            if glow is not None and glow.get('radius', 0) > 0 and glow.get('intensity', 0) > 0:
-                has_glow = True
-        
-        if 'outer_glow' in style_data:
-            # 只有当outer_glow的radius和intensity都大于0时才算有发光效果
-            outer_glow = style_data['outer_glow']
-            if outer_glow is not None and outer_glow.get('radius', 0) > 0 and outer_glow.get('intensity', 0) > 0:
-                has_glow = True
-        
-        if debug_info != "none":
+        if debug_lvl:
             print(f"[PIP_ArtisticWords] Image dimensions: {width}x{height}")
             print(f"[PIP_ArtisticWords] Safe area: {safe_area}")
             print(f"[PIP_ArtisticWords] Margins: Top: {margin_top*100:.1f}%, Bottom: {margin_bottom*100:.1f}%, Left: {margin_left*100:.1f}%, Right: {margin_right*100:.1f}%")
@@ -182,7 +217,7 @@ class ArtisticTextNode:
         # Create text renderer and effects processor
         font_size = style_data.get('font_size', 100)
         text_renderer = TextRenderer(font_path, font_size)
-        effects_processor = EffectsProcessor(debug_output=False)
+        effects_processor = self._get_effects_processor()
         
         # Render base text image
         base_text_image = text_renderer.create_base_text_image(
@@ -194,11 +229,11 @@ class ArtisticTextNode:
             safe_area=safe_area
         )
         
-        # Apply style effects
-        style_data['actual_font_size'] = text_renderer.font_size  # 使用渲染器的实际字体大小而不是原始值
+        # Apply style effects (the fitted font size is read from the renderer; the
+        # style dict is shared through the cached StyleManager and stays unmodified)
         
         # 添加更多调试信息
-        if debug_info == "detailed":
+        if debug_lvl >= 2:
             print(f"[PIP_ArtisticWords] 应用效果前字体大小: {text_renderer.font_size}")
             print(f"[PIP_ArtisticWords] 样式效果: {[k for k in style_data.keys() if k in ['outline', 'shadow', 'gradient', 'bevel', 'glow', 'inner_shadow']]}")
             
@@ -226,33 +261,53 @@ class ArtisticTextNode:
                 print(f"[艺术文字节点-内阴影] Y偏移: {inner_shadow.get('offset_y')}")
                 print(f"[艺术文字节点-内阴影] 模糊: {inner_shadow.get('blur')}")
         
-        styled_text_result = effects_processor.apply_all_effects(base_text_image, style_data, style_name="artistic_text")
+        # 基础文字图完全透明（文本为空或被完全裁掉）时，特效与合成都不会改变原图，直接跳过
+        has_text = base_text_image.getbbox() is not None
         
-        # 修复: apply_all_effects 返回 (image, layers) 元组，我们只需要第一个元素
-        if isinstance(styled_text_result, tuple) and len(styled_text_result) >= 1:
-            styled_text_image = styled_text_result[0]  # 获取结果图像
-            print("[艺术文字节点] 成功从apply_all_effects获取结果图像")
-        else:
-            styled_text_image = styled_text_result  # 如果不是元组，直接使用
+        if has_text:
+            styled_text_result = effects_processor.apply_all_effects(base_text_image, style_data, style_name="artistic_text")
+            
+            # 修复: apply_all_effects 返回 (image, layers) 元组，我们只需要第一个元素
+            if isinstance(styled_text_result, tuple) and len(styled_text_result) >= 1:
+                styled_text_image = styled_text_result[0]  # 获取结果图像
+                if debug_lvl:
+                    print("[艺术文字节点] 成功从apply_all_effects获取结果图像")
+            else:
+                styled_text_image = styled_text_result  # 如果不是元组，直接使用
+        elif debug_lvl:
+            print("[PIP_ArtisticWords] 没有可见文字，跳过特效处理")
         
-        # 创建一个新的透明图像作为结果
-        result_image = Image.new('RGBA', pil_image.size, (0, 0, 0, 0))
+        # 批次中各帧尺寸相同，文字层只渲染一次，逐帧合成
+        frames = [image] if image.ndim == 3 else [image[i] for i in range(image.shape[0])]
+        results = []
+        for i, frame in enumerate(frames):
+            # 合成底图需要RGBA：尚未转换过输入时直接由张量生成RGBA图像，省去RGB图像再convert的一次整幅复制
+            if i == 0 and pil_image is not None:
+                pil_image_rgba = pil_image if pil_image.mode == 'RGBA' else pil_image.convert('RGBA')
+            else:
+                pil_image_rgba = tensor_to_rgba_pil(frame)
+            results.append(self._composite_frame(pil_image_rgba, styled_text_image if has_text else None, opacity))
         
-        # 把原始图像粘贴到结果图上
-        pil_image_rgba = pil_image.convert('RGBA')
-        result_image.paste(pil_image_rgba, (0, 0))
+        # 转换回张量 (BHWC 格式)
+        result_tensor = results[0] if len(results) == 1 else torch.cat(results, dim=0)
         
-        # 使用alpha_composite方法合成，这会保留所有特效
-        result_image = Image.alpha_composite(result_image, styled_text_image)
+        return (result_tensor,)
+    
+    def _composite_frame(self, pil_image_rgba, styled_text_image, opacity):
+        """把文字层合成到一帧RGBA图像上并应用透明度，返回该帧的BHWC张量（文字层为None时不合成）"""
+        # 直接以原始图像为底合成（alpha_composite返回新图像，不修改原图），这会保留所有特效
+        if styled_text_image is None:
+            result_image = pil_image_rgba
+        else:
+            result_image = Image.alpha_composite(pil_image_rgba, styled_text_image)
         
         # 应用透明度设置
         if opacity < 1.0:
-            # 调整文字层的透明度
-            r, g, b, a = result_image.split()
-            a = a.point(lambda x: int(x * opacity) if x > 0 else 0)
-            result_image = Image.merge('RGBA', (r, g, b, a))
-        
-        # 转换回张量 (BHWC 格式)
-        result_tensor = pil_to_tensor(result_image)
+            # 调整文字层的透明度：直接在数组的alpha平面上查表，不再拆分/合并通道
+            result_arr = np.array(result_image)
+            result_arr[..., 3] = self._opacity_lut(opacity)[result_arr[..., 3]]
+        else:
+            result_arr = np.asarray(result_image)
         
-        return (result_tensor,)
+        # 直接由数组构建张量
+        return array_to_tensor(result_arr)
@@ -2,6 +2,21 @@ import torch
 import numpy as np
 from PIL import Image
 
+def _tensor_to_uint8(tensor):
+    """
+    Convert a BHWC/HWC [0,1] tensor to an HWC uint8 NumPy array (first image if batched).
+    """
+    # Handle different tensor shapes
+    if tensor.ndim == 4:
+        # BHWC format - take first image if batched
+        tensor = tensor[0]
+    
+    # Scale to [0, 255] and cast on the torch side so that only a uint8
+    # buffer is materialized (no float intermediate of the full image) and,
+    # for GPU tensors, only uint8 data crosses to the host. detach() keeps
+    # autograd from recording the scaling when the input requires grad.
+    return tensor.detach().mul(255).clamp_(0, 255).to(torch.uint8).cpu().numpy()
+
 def tensor_to_pil(tensor):
     """
     Convert a PyTorch tensor to a PIL Image.
@@ -13,13 +28,7 @@ def tensor_to_pil(tensor):
     Returns:
         PIL.Image object
     """
-    # Handle different tensor shapes
-    if tensor.ndim == 4:
-        # BHWC format - take first image if batched
-        tensor = tensor[0]
-    
-    # Convert to numpy and scale to [0, 255]
-    img_np = (tensor.cpu().numpy() * 255.0).astype(np.uint8)
+    img_np = _tensor_to_uint8(tensor)
     
     # Create appropriate PIL image based on number of channels
     if img_np.shape[2] == 4:  # RGBA
@@ -33,6 +42,33 @@ def tensor_to_pil(tensor):
     
     return img
 
+def tensor_to_rgba_pil(tensor):
+    """
+    Convert a PyTorch tensor to an RGBA PIL Image.
+    
+    RGB tensors are written straight into an RGBA buffer with an opaque alpha
+    channel, instead of building an RGB image and copying it again with
+    convert('RGBA').
+    
+    Args:
+        tensor: PyTorch tensor in BHWC format with values in [0,1]
+        
+    Returns:
+        PIL.Image object in RGBA mode
+    """
+    img_np = _tensor_to_uint8(tensor)
+    
+    if img_np.shape[2] == 4:
+        return Image.fromarray(img_np, 'RGBA')
+    if img_np.shape[2] == 3:
+        rgba = np.empty(img_np.shape[:2] + (4,), dtype=np.uint8)
+        rgba[..., :3] = img_np
+        rgba[..., 3] = 255
+        return Image.fromarray(rgba, 'RGBA')
+    if img_np.shape[2] == 1:
+        return Image.fromarray(img_np.squeeze(2), 'L').convert('RGBA')
+    raise ValueError(f"Unsupported tensor shape: {tuple(tensor.shape)}")
+
 def pil_to_tensor(img):
     """
     Convert a PIL Image to a PyTorch tensor.
@@ -67,8 +103,24 @@ def pil_to_tensor(img):
         else:
             img = img.convert('RGB')
     
-    # Convert to numpy array and normalize to [0, 1]
-    img_np = np.array(img).astype(np.float32) / 255.0
+    return array_to_tensor(np.asarray(img))
+
+def array_to_tensor(img_np):
+    """
+    Convert an HWC uint8 NumPy array to a PyTorch tensor.
+    Returns tensor in ComfyUI's standard BHWC format with float32 [0,1] range.
+    
+    Args:
+        img_np: NumPy uint8 array in HWC format
+        
+    Returns:
+        PyTorch tensor in BHWC format with float32 [0,1] range
+    """
+    # Normalize to [0, 1] in place on the single float32 copy; astype returns
+    # a fresh C-contiguous buffer, so the tensor shares it without a copy and
+    # stays contiguous for any later device transfer
+    img_np = img_np.astype(np.float32)
+    img_np /= 255.0
     
     # Add batch dimension for BHWC format
     tensor = torch.from_numpy(img_np).unsqueeze(0)